@@ -0,0 +1,160 @@
+"""Answer a file of natural-language questions in one run, for either backend.
+
+Usage: python -m ask.batch {mysql,mongodb} <table or collection> <questions file> [--output results.jsonl] [--workers 4]
+
+The questions file has one question per line, or one JSON object per line with the question under
+"question" (or "text"/"body") and an optional "id" (or "request_id"). The table is profiled and its
+patterns built once; identical generated queries run only once, at most --workers in flight at a time on
+the async engine (utils/async_engine.py), and every question gets one JSON line in the output, in input order.
+"""
+import argparse
+import json
+import os
+import time
+
+import config
+from utils.async_engine import run_queries
+from utils.result_cache import query_key
+
+# Keys of a JSONL record holding the question, tried in order
+QUESTION_KEYS = ("question", "text", "body")
+# Keys of a JSONL record holding its id, tried in order
+ID_KEYS = ("id", "request_id")
+
+
+def read_questions(path):
+    """[(id, question, error)] of a questions file; plain lines are numbered from 1.
+
+    A malformed JSON line is kept with its line number as id and the parse error, so it gets an error record."""
+    questions = []
+    with open(path, encoding="utf-8") as file:
+        for line_number, line in enumerate(file, start=1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            question_id = line_number
+            if line.startswith("{"):
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError as e:
+                    questions.append((line_number, line, f"Malformed JSON on line {line_number}: {e}"))
+                    continue
+                question_id = next((record[key] for key in ID_KEYS if key in record), line_number)
+                line = next((record[key] for key in QUESTION_KEYS if record.get(key)), "")
+            questions.append((question_id, line, None))
+    return questions
+
+
+def parse_questions(session, questions):
+    """(query, description, error) per question; a question that breaks its handler is reported, not fatal."""
+    parsed = []
+    for _, question, error in questions:
+        if error:
+            parsed.append((None, None, error))
+            continue
+        try:
+            query, description = session.parse(question)
+            parsed.append((query, description, None))
+        except Exception as e:
+            parsed.append((None, None, f"Could not parse the question: {e}"))
+    return parsed
+
+
+def run_unique(db_type, name, queries, workers):
+    """Run each distinct query once, at most `workers` in flight on the async engine; returns query key -> result.
+
+    A query that fails maps to the exception it raised."""
+    unique = {}
+    for query in queries:
+        if query:
+            unique.setdefault(query_key(query), query)
+    results = run_queries([(db_type, name, query) for query in unique.values()], workers)
+    return dict(zip(unique, results))
+
+
+def mysql_session(table_name):
+    """Parser session of a MySQL table, or None if it does not exist or cannot be profiled."""
+    from pymysql import MySQLError
+    from ask.mysql_ask.mysql_helpers import connect_to_database
+    from ask.mysql_ask.mysql_session import get_session
+
+    connection = connect_to_database()
+    if connection is None:
+        return None
+    try:
+        return get_session(connection, table_name)
+    except MySQLError as err:
+        print(f"Database error: {err}")
+        return None
+    finally:
+        connection.close()
+
+
+def mongo_session(collection_name):
+    """Parser session of a MongoDB collection, or None if it does not exist or cannot be profiled."""
+    from ask.mongo_ask.mongo_helpers_NLP import connect_to_db
+    from ask.mongo_ask.mongo_session_NLP import get_session
+
+    db = connect_to_db()
+    if db is None:
+        return None
+    if collection_name not in db.list_collection_names():
+        print(f"Collection '{collection_name}' does not exist in the database.")
+        return None
+    try:
+        return get_session(db, collection_name)
+    except Exception as e:
+        print(f"Error initializing patterns: {e}")
+        return None
+
+
+def run_batch(db_type, name, input_path, output_path, workers=None):
+    """Answer every question of `input_path` against table/collection `name` and write JSONL to `output_path`."""
+    workers = workers or config.BATCH_WORKERS
+    questions = read_questions(input_path)
+    start = time.perf_counter()
+    session = mysql_session(name) if db_type == 'mysql' else mongo_session(name)
+    if session is None:
+        print("Could not open the table for the batch.")
+        return None
+    parsed = parse_questions(session, questions)
+    results = run_unique(db_type, name, [query for query, _, _ in parsed], workers)
+
+    answered = 0
+    with open(output_path, "w", encoding="utf-8") as output:
+        for (question_id, question, _), (query, description, error) in zip(questions, parsed):
+            record = {"id": question_id, "question": question, "query": query, "description": description}
+            if query:
+                rows = results[query_key(query)]
+                if isinstance(rows, Exception):
+                    error = f"Query execution failed: {rows}"
+                else:
+                    record["row_count"] = len(rows)
+                    record["rows"] = rows
+                    answered += 1
+            elif error is None:
+                error = description
+            if error:
+                record["error"] = error
+            output.write(json.dumps(record, default=str) + "\n")
+    elapsed = time.perf_counter() - start
+
+    print(f"Answered {answered} of {len(questions)} questions with {len(results)} distinct queries "
+          f"using {workers} worker(s) in {elapsed:.2f}s; results written to {output_path}.")
+    return answered
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Answer a file of natural-language questions and write JSONL results.")
+    parser.add_argument("db_type", choices=config.DBMS_OPTIONS)
+    parser.add_argument("name", help="table (MySQL) or collection (MongoDB) to query")
+    parser.add_argument("questions", help="text file with one question per line, or JSONL")
+    parser.add_argument("--output", help="JSONL results file (default: <questions>.results.jsonl)")
+    parser.add_argument("--workers", type=int, default=config.BATCH_WORKERS)
+    args = parser.parse_args()
+    output = args.output or f"{os.path.splitext(args.questions)[0]}.results.jsonl"
+    run_batch(args.db_type, args.name, args.questions, output, args.workers)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,39 @@
-from ask.mongo_ask.mongo_globals_NLP import FIELD_MAPPING, KNOWN_STORE_LOCATIONS
-from ask.mongo_ask.mongo_helpers_NLP import connect_to_db, gather_metrics
-from ask.mongo_ask.mongo_query_parser_NLP import parse_query_nltk
-from ask.mongo_ask.mongo_patterns_NLP import initialize_patterns
+from ask.mongo_ask.mongo_globals_NLP import PARSE_CACHE
+from ask.mongo_ask.mongo_helpers_NLP import connect_to_db
+from ask.mongo_ask.mongo_session_NLP import get_session
 from pprintpp import pprint
+from utils.metrics_cache import mongo_collection_version
+from utils.result_cache import RESULT_CACHE, cached_result, get_result, store_result
+from utils.async_engine import run_query
+from utils.mongo_window import query_window
+import config
 
 def execute_query_mongo(collection, query):
-    """Execute MongoDB query and return results."""
+    """Execute MongoDB query on the shared async engine and return results, reused while the collection is unchanged."""
+    def run():
+        # Aggregate pipelines (list) and find filters (dict) alike
+        return run_query('mongodb', collection.name, query)
+
+    try:
+        return cached_result('mongodb', collection.name, query, mongo_collection_version(collection), run)
+    except Exception as e:
+        print(f"MongoDB Execution Error: {e}")
+        return None
+
+
+def stream_query_mongo(collection, query):
+    """(first documents, total count) of a MongoDB query for display, fetching only the documents shown.
+
+    Results that fit in the window are complete, so they are cached like execute_query_mongo's."""
     try:
-        if isinstance(query, list):
-            return list(collection.aggregate(query))  # Aggregate pipeline queries
-        elif isinstance(query, dict):
-            return list(collection.find(query))  # Standard find queries
+        version = mongo_collection_version(collection)
+        documents = get_result('mongodb', collection.name, query, version)
+        if documents is not None:
+            return documents[:config.MONGO_PRINT_MAX_DOCS], len(documents)
+        documents, total = query_window(collection, query)
+        if total == len(documents):
+            store_result('mongodb', collection.name, query, version, documents)
+        return documents, total
     except Exception as e:
         print(f"MongoDB Execution Error: {e}")
         return None
@@ -33,14 +56,9 @@ def run_cli(collection_name):
         return
 
 
-    # Gather metrics for the collection
-    table_info = gather_metrics(db, collection_name)
-   
-    # pprint(table_info)
-   
+    # Gather metrics and initialize patterns (reused if this collection was opened before and has not changed)
     try:
-        initialize_patterns(db, collection_name, table_info)
-        # print(FIELD_MAPPING)
+        session = get_session(db, collection_name)
     except Exception as e:
         print(f"Error initializing patterns: {e}")
         return
@@ -52,17 +70,23 @@ def run_cli(collection_name):
         # try:
             user_input = input("Enter your query: ").strip().lower()
             if user_input in ['exit', 'quit']:
+                print(f"Parse cache: {PARSE_CACHE.summary()}")
+                print(f"Result cache: {RESULT_CACHE.summary()}")
                 print("Exiting CLI. Goodbye!")
                 break
 
             # Parse the query
-            query, description = parse_query_nltk(user_input, table_info)
+            query, description = session.parse(user_input)
             if query:
                 print(f"Generated MongoDB Query: {query}")
-                result = execute_query_mongo(collection, query)
-                if result:
+                result = stream_query_mongo(collection, query)
+                if result and result[1]:
+                    documents, total = result
                     print("Query Results:")
-                    for doc in result:
+                    if total > len(documents):
+                        documents = documents[:config.MONGO_PRINT_HEAD_DOCS]
+                        print(f"Showing the first {len(documents)} of {total} documents:")
+                    for doc in documents:
                         print(doc)
                 else:
                     print("No matching records found.")
@@ -1,6 +1,8 @@
-from ask.mongo_ask.mongo_helpers_NLP import gather_metrics
-from ask.mongo_ask.mongo_globals_NLP import FIELD_MAPPING, KNOWN_STORE_LOCATIONS, PATTERNS
+from ask.mongo_ask.mongo_query_parser_NLP import PATTERN_HANDLERS
 import re
+from utils.nlp import compile_dispatch
+from utils.phrase_matcher import PhraseMatcher
+from utils.metrics_cache import schema_fingerprint
 from pprintpp import pprint
 def generate_column_keywords(table_info):
     """Dynamically generate synonyms for each column."""
@@ -59,33 +61,24 @@ def generate_keywords(column_name, keyword_patterns):
     return list(set(synonyms))
 
 
-def initialize_patterns(db, collection_name, table_info):
-    """Dynamically initialize patterns based on MongoDB collection schema."""
-    global FIELD_MAPPING, PATTERNS, KNOWN_STORE_LOCATIONS
+def initialize_patterns(session):
+    """Dynamically initialize the patterns of a session based on its MongoDB collection schema."""
+    field_mapping = session.field_mapping
 
-    # Step 1: Gather collection metrics
-    # table_info = gather_metrics(db, collection_name)
-
-    # Step 2: Generate column keywords and populate FIELD_MAPPING
-    column_keywords = generate_column_keywords(table_info)
+    # Step 1: Generate column keywords and populate the field mapping
+    column_keywords = generate_column_keywords(session.table_info)
     for column, synonyms in column_keywords.items():
         for synonym in synonyms:
-            FIELD_MAPPING[synonym] = column  # Map each synonym to its corresponding column
-
-    # REMOVE
-    # print(FIELD_MAPPING)
-    # print(KNOWN_STORE_LOCATIONS)
-    # Debug: Ensure FIELD_MAPPING is populated before further usage
-    # print("Debug: FIELD_MAPPING after synonym population:", FIELD_MAPPING)
-
-    # Step 3: Fetch dynamic fields (AFTER FIELD_MAPPING is populated)
-    quantity_field = FIELD_MAPPING.get("quantity", 1)  # Default to 1 if not found
-    price_field = FIELD_MAPPING.get("price", "price_usd")  # Default to 'price_usd' if not found
-    product_field = FIELD_MAPPING.get("product", "product")
-    location_field = FIELD_MAPPING.get("location", "store")
-    date_field = FIELD_MAPPING.get("date", "launch_date")
-    stream_field = FIELD_MAPPING.get("stream", "streams")
-    name_field = FIELD_MAPPING.get("name", "artist_name")
+            field_mapping[synonym] = column  # Map each synonym to its corresponding column
+
+    # Step 2: Fetch dynamic fields (AFTER the field mapping is populated)
+    quantity_field = field_mapping.get("quantity", 1)  # Default to 1 if not found
+    price_field = field_mapping.get("price", "price_usd")  # Default to 'price_usd' if not found
+    product_field = field_mapping.get("product", "product")
+    location_field = field_mapping.get("location", "store")
+    date_field = field_mapping.get("date", "launch_date")
+    stream_field = field_mapping.get("stream", "streams")
+    name_field = field_mapping.get("name", "artist_name")
     # Debug the fetched fields
     # print(f"Quantity Field: {quantity_field}, Price Field: {price_field}, Product Field: {product_field}, Location Field: {location_field}, Date Field: {date_field}")
 
@@ -117,12 +110,12 @@ def initialize_patterns(db, collection_name, table_info):
     "mongodb": [
         {
             "$group": {
-                "_id": f"${FIELD_MAPPING.get('location', 'store')}",  # Dynamically resolve 'location'
+                "_id": f"${field_mapping.get('location', 'store')}",  # Dynamically resolve 'location'
                 "total_sales": {
                     "$sum": {
                         "$multiply": [
-                            f"${FIELD_MAPPING.get('quantity', 1)}" if FIELD_MAPPING.get('quantity', 1) != 1 else "1",
-                            f"${FIELD_MAPPING.get('price', 'price_usd')}"
+                            f"${field_mapping.get('quantity', 1)}" if field_mapping.get('quantity', 1) != 1 else "1",
+                            f"${field_mapping.get('price', 'price_usd')}"
                         ]
                     }
                 }
@@ -136,24 +129,26 @@ def initialize_patterns(db, collection_name, table_info):
     "pattern": r".*total sales (in|on|for|during) ([\w\s,]+)",
     "mongodb": {
         "specific_date": [
-            {"$match": {"date_field": "specific_date"}},  # Replace date_field and specific_date dynamically
+            {"$match": {"{DATE_FIELD}": "{SPECIFIC_DATE}"}},  # Replace date_field and specific_date dynamically
             {"$group": {
                 "_id": None,
                 "total_sales": {
                     "$sum": {"$multiply": [
-                            f"${FIELD_MAPPING.get('quantity', 1)}" if FIELD_MAPPING.get('quantity', 1) != 1 else "1",
-                            f"${FIELD_MAPPING.get('price', 'price_usd')}"]}  # Replace dynamically
+                            f"${field_mapping.get('quantity', 1)}" if field_mapping.get('quantity', 1) != 1 else "1",
+                            f"${field_mapping.get('price', 'price_usd')}"]}  # Replace dynamically
                 }
             }}
         ],
         "month": [
             {"$match": {
-                "$expr": {"$eq": [{"$month": "$date_field"}, "month"]}  # Replace dynamically
+                "$expr": {"$eq": [{"$month": "${DATE_FIELD}"}, "{MONTH}"]}  # Replace dynamically
             }},
             {"$group": {
                 "_id": None,
                 "total_sales": {
-                    "$sum": {"$multiply": ["$quantity_field", "$price_field"]}  # Replace dynamically
+                    "$sum": {"$multiply": [
+                            f"${quantity_field}" if quantity_field != 1 else 1,
+                            f"${price_field}"]}  # Replace dynamically
                 }
             }}
         ],
@@ -162,8 +157,8 @@ def initialize_patterns(db, collection_name, table_info):
         "$match": {
             "$expr": {
                 "$eq": [
-                    { "$year": "$transaction_date" },
-                    2023
+                    { "$year": "${DATE_FIELD}" },
+                    "{YEAR}"
                 ]
             }
         }
@@ -173,7 +168,9 @@ def initialize_patterns(db, collection_name, table_info):
             "_id": None,
             "total_sales": {
                 "$sum": {
-                    "$multiply": ["$transaction_qty", "$unit_price"]
+                    "$multiply": [
+                            f"${quantity_field}" if quantity_field != 1 else 1,
+                            f"${price_field}"]
                 }
             }
         }
@@ -212,7 +209,6 @@ def initialize_patterns(db, collection_name, table_info):
             "description": "This query retrieves the top {limit} best-selling products or models by quantity."
         },
 
-         # TODO: FIX THE REGEX SO THAT IT MATCHES "WORST" AND "LEAST"
         "top_least_streamed_songs": {
             "pattern": r"(top (\d+)\s+(?:(least|worst|least)[-\s]?streamed)\s+(tracks|songs))|((song|track)\s+with\s+lowest\s+streams)",
             "mongodb": [
@@ -341,7 +337,7 @@ def initialize_patterns(db, collection_name, table_info):
             "mongodb": [
                 {
                     "$group": {
-                    "_id": f"${FIELD_MAPPING.get('field', '_id')}",  # Group by phone_model
+                    "_id": f"${field_mapping.get('field', '_id')}",  # Group by phone_model
                     "avg_price": { "$avg": f"${price_field}" }  # Calculate average of price_usd
                     }
                 }
@@ -352,9 +348,9 @@ def initialize_patterns(db, collection_name, table_info):
         "most_expensive": {
             "pattern": r".*most expensive (phone|product|item|model)",
             "mongodb": [
-                {"$sort": {FIELD_MAPPING.get('price', 'price'): -1}},  # Replace dynamically
+                {"$sort": {field_mapping.get('price', 'price'): -1}},  # Replace dynamically
                 {"$limit": 1},
-                {"$project": {FIELD_MAPPING.get('product', 'product'): 1, "_id": 0}}
+                {"$project": {field_mapping.get('product', 'product'): 1, "_id": 0}}
             ],
             "description": "This query retrieves the most expensive product."
         },
@@ -368,7 +364,7 @@ def initialize_patterns(db, collection_name, table_info):
                     {
                         "$limit": 1 # // Limit the result to the top document
                     },
-                    {"$project": {f"{FIELD_MAPPING.get('product', 'product')}": 1, "{FIELD_NAME}": 1, "_id": 0}}
+                    {"$project": {f"{field_mapping.get('product', 'product')}": 1, "{FIELD_NAME}": 1, "_id": 0}}
             ],
             "description": "This query retrieves the most expensive product."
         },
@@ -382,7 +378,7 @@ def initialize_patterns(db, collection_name, table_info):
                     {
                         "$limit": 1 # // Limit the result to the top document
                     },
-                    {"$project": {f"{FIELD_MAPPING.get('product', 'product')}": 1, "{FIELD_NAME}": 1, "_id": 0}}
+                    {"$project": {f"{field_mapping.get('product', 'product')}": 1, "{FIELD_NAME}": 1, "_id": 0}}
             ],
             "description": "This query retrieves the most expensive product."
         },
@@ -411,16 +407,88 @@ def initialize_patterns(db, collection_name, table_info):
         "least_expensive": {
             "pattern": r".*least expensive (phone|product|item|model)",
             "mongodb": [
-                {"$sort": {FIELD_MAPPING.get("price", "price"): 1}},  # Replace dynamically
+                {"$sort": {field_mapping.get("price", "price"): 1}},  # Replace dynamically
                 {"$limit": 1},
-                {"$project": {FIELD_MAPPING.get('product', 'product'): 1, "_id": 0}}
+                {"$project": {field_mapping.get('product', 'product'): 1, "_id": 0}}
             ],
             "description": "This query retrieves the least expensive product."
         },
 
     }
 
-    # Update PATTERNS globally
-    PATTERNS.update(static_patterns)
-
-    
\ No newline at end of file
+    session.patterns.update(static_patterns)
+    compile_patterns(session)
+    build_phrase_index(session)
+    session.registry["schema_version"] = schema_fingerprint('mongodb', session.collection_name, session.table_info,
+                                                            field_mapping, session.known_store_locations)
+
+
+# Placeholder tokens used in the pipeline templates and the build() parameter each one binds
+TEMPLATE_PLACEHOLDERS = {
+    "{GROUP_FIELD}": "group_field",
+    "{FIELD_NAME}": "field_name",
+    "{LIMIT}": "limit",
+    "{DATE_FIELD}": "date_field",
+    "{SPECIFIC_DATE}": "specific_date",
+    "{MONTH}": "month",
+    "{YEAR}": "year",
+}
+
+
+def compile_template(template):
+    """Precompile a pipeline template into build(params) -> a fresh pipeline with the placeholders bound.
+
+    A string that is exactly a placeholder takes the parameter as is (so limits and months stay numbers);
+    a string containing placeholders has them substituted; everything else is copied.
+    """
+    if isinstance(template, dict):
+        items = [(compile_template(key), compile_template(value)) for key, value in template.items()]
+        return lambda params: {key(params): value(params) for key, value in items}
+    if isinstance(template, list):
+        items = [compile_template(value) for value in template]
+        return lambda params: [item(params) for item in items]
+    if isinstance(template, str):
+        if template in TEMPLATE_PLACEHOLDERS:
+            name = TEMPLATE_PLACEHOLDERS[template]
+            return lambda params: params[name]
+        tokens = [(token, name) for token, name in TEMPLATE_PLACEHOLDERS.items() if token in template]
+        if tokens:
+            def bind(params):
+                value = template
+                for token, name in tokens:
+                    value = value.replace(token, str(params[name]))
+                return value
+            return bind
+    return lambda params: template
+
+
+def compile_patterns(session):
+    """Compile every pattern and pipeline template once, in pattern order (the first match wins)."""
+    entries = []
+    dispatch = []
+    for pattern_key, pattern_details in session.patterns.items():
+        pattern_details["regex"] = re.compile(pattern_details["pattern"], re.IGNORECASE)
+        template = pattern_details["mongodb"]
+        if isinstance(template, dict):
+            # Several alternative pipelines, e.g. per date granularity
+            pattern_details["build"] = {name: compile_template(pipeline) for name, pipeline in template.items()}
+        else:
+            pattern_details["build"] = compile_template(template)
+        entries.append((pattern_key, pattern_details["regex"], PATTERN_HANDLERS.get(pattern_key)))
+        dispatch.append(compile_dispatch(pattern_details["pattern"]))
+
+    session.registry["entries"] = entries
+    session.registry["dispatch"] = dispatch
+
+
+def build_phrase_index(session):
+    """Build the matchers for multi-word synonyms and store locations, and the categorical value lookup."""
+    session.phrase_index["field_phrases"] = PhraseMatcher(
+        {phrase: column for phrase, column in session.field_mapping.items() if " " in phrase})
+    session.phrase_index["locations"] = PhraseMatcher(session.known_store_locations)
+    values = {}
+    for column, details in session.table_info["categorical"].items():
+        for value in details["unique_values"]:
+            if isinstance(value, str):
+                values.setdefault(value.lower(), column)  # The first column holding a value wins
+    session.phrase_index["values"] = values
@@ -0,0 +1,76 @@
+import threading
+from ask.mongo_ask.mongo_globals_NLP import PROFILE_LOCKS, SESSIONS, SESSIONS_LOCK
+from ask.mongo_ask.mongo_helpers_NLP import gather_metrics
+from ask.mongo_ask.mongo_patterns_NLP import initialize_patterns
+from ask.mongo_ask.mongo_query_parser_NLP import parse_query_nltk
+from utils.metrics_cache import mongo_collection_version, schema_fingerprint
+
+
+class MongoSession:
+    """Natural-language parser state of one collection: its field mapping, store locations and compiled patterns.
+
+    Built once from the collection profile and only read while parsing, so sessions of different collections
+    can answer questions concurrently.
+    """
+
+    def __init__(self, collection_name, profile):
+        self.collection_name = collection_name
+        self.table_info = profile['table_info']
+        self.profile_version = schema_fingerprint(profile)
+        # mongo_collection_version the session was last checked at, set by get_session
+        self.collection_version = None
+        # Copies: the patterns add synonyms, and the profile is shared through the metrics cache
+        self.field_mapping = dict(profile['field_mapping'])
+        self.known_store_locations = dict(profile['known_store_locations'])
+        self.patterns = {}
+        # Compiled patterns and pipeline builders: 'entries' is [(pattern_key, compiled regex, handler)] in match
+        # order, 'dispatch' the regexes that pick an entry (see compile_dispatch), 'schema_version' fingerprints
+        # what they were built from
+        self.registry = {"entries": [], "dispatch": [], "schema_version": None}
+        # Phrase matchers over the multi-word synonyms and the store locations, and categorical value -> field
+        self.phrase_index = {"field_phrases": None, "locations": None, "values": {}}
+        initialize_patterns(self)
+
+    def parse(self, user_input):
+        return parse_query_nltk(user_input, self)
+
+
+def warm_session(collection_name, version):
+    with SESSIONS_LOCK:
+        session = SESSIONS.get(collection_name)
+    return session if session is not None and session.collection_version == version else None
+
+
+def profile_lock(collection_name):
+    with SESSIONS_LOCK:
+        return PROFILE_LOCKS.setdefault(collection_name, threading.Lock())
+
+
+def get_session(db, collection_name, version=None):
+    """Warm session of `collection_name`, rebuilt only when the collection's profile has changed; None if the
+    collection does not exist.
+
+    `version` is the collection's mongo_collection_version when the caller has already read it. While it is
+    unchanged the warm session is returned without touching the profile.
+    """
+    if version is None:
+        version = mongo_collection_version(db[collection_name])
+    session = warm_session(collection_name, version)
+    if session is not None:
+        return session
+    with profile_lock(collection_name):
+        # Another request may have profiled the collection while this one waited
+        session = warm_session(collection_name, version)
+        if session is not None:
+            return session
+        if not db.list_collection_names(filter={"name": collection_name}):
+            return None
+        profile = gather_metrics(db, collection_name)
+        with SESSIONS_LOCK:
+            session = SESSIONS.get(collection_name)
+        if session is None or session.profile_version != schema_fingerprint(profile):
+            session = MongoSession(collection_name, profile)
+        session.collection_version = version
+        with SESSIONS_LOCK:
+            SESSIONS[collection_name] = session
+    return session
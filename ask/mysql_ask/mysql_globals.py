@@ -1,3 +1,12 @@
-FIELD_MAPPING = {}
-PATTERNS = {}
-KNOWN_STORE_LOCATIONS = {}
+import threading
+import config
+from utils.lru_cache import LRUCache
+
+# Parser state lives in one MySQLSession per table (see mysql_session.py); what is shared across tables is here.
+# (normalized question, schema_version) -> (query, description) of questions already parsed
+PARSE_CACHE = LRUCache(config.PARSE_CACHE_SIZE)
+# Warm sessions by table name, so switching back to a table does not rebuild its patterns
+SESSIONS = {}
+SESSIONS_LOCK = threading.Lock()
+# One lock per table, so concurrent first requests profile it once and share the session
+PROFILE_LOCKS = {}
@@ -1,15 +1,61 @@
-from ask.mysql_ask.mysql_helpers import connect_to_database, log_query, gather_metrics
-from ask.mysql_ask.mysql_query_parser import parse_query_nltk
-from ask.mysql_ask.mysql_globals import FIELD_MAPPING, KNOWN_STORE_LOCATIONS
-from ask.mysql_ask.mysql_patterns import initialize_patterns
-import mysql.connector
-def execute_query(connection, query):
-    """Execute SQL query and return results."""
+from ask.mysql_ask.mysql_helpers import connect_to_database, log_query
+from ask.mysql_ask.mysql_globals import PARSE_CACHE
+from ask.mysql_ask.mysql_session import get_session
+from pymysql import MySQLError
+from pymysql.cursors import SSCursor
+import config
+from utils.metrics_cache import mysql_table_version
+from utils.result_cache import RESULT_CACHE, cached_result, get_result, store_result
+from utils.async_engine import run_query
+from utils.row_window import RowWindow, stream_rows
+def execute_query(connection, query, table_name=None):
+    """Execute SQL query on the shared async engine and return results, reused while `table_name` is unchanged."""
+    cursor = connection.cursor()
     try:
-        cursor = connection.cursor()
+
+        def run():
+            return run_query('mysql', table_name, query)
+        if table_name is None:
+            return run()
+        return cached_result('mysql', table_name, query, mysql_table_version(cursor, table_name), run)
+    except MySQLError as err:
+        print(f"SQL Execution Error: {err}")
+        log_query(query, f"Error: {err}")
+        return None
+    except Exception as e:
+        print(f"Unexpected error during query execution: {e}")
+        log_query(query, f"Unexpected error: {e}")
+        return None
+    finally:
+        cursor.close()
+
+def stream_query(connection, query, table_name, window):
+    """Execute SQL query for display, passing its rows through `window` (a RowWindow) as they arrive.
+
+    The cursor is server-side, so rows are read from the server in STREAM_FETCH_SIZE batches instead of all at
+    once; only results small enough for the result cache are also collected, and cached. Returns the window.
+    """
+    cursor = connection.cursor(SSCursor)
+    try:
+        version_cursor = connection.cursor()
+        version = mysql_table_version(version_cursor, table_name)
+        version_cursor.close()
+        rows = get_result('mysql', table_name, query, version)
+        if rows is not None:
+            window.extend(rows)
+            return window
         cursor.execute(query)
-        return cursor.fetchall()
-    except mysql.connector.Error as err:
+        rows = []
+        for batch in stream_rows(cursor):
+            window.extend(batch)
+            if rows is not None:
+                rows.extend(batch)
+                if len(rows) > config.RESULT_CACHE_MAX_ROWS:
+                    rows = None  # Too long to cache; keep only the window from here on
+        if rows is not None:
+            store_result('mysql', table_name, query, version, rows)
+        return window
+    except MySQLError as err:
         print(f"SQL Execution Error: {err}")
         log_query(query, f"Error: {err}")
         return None
@@ -17,6 +63,8 @@ def execute_query(connection, query):
         print(f"Unexpected error during query execution: {e}")
         log_query(query, f"Unexpected error: {e}")
         return None
+    finally:
+        cursor.close()
 
 def run_cli(table_name):
     """Run the CLI for user queries."""
@@ -25,10 +73,16 @@ def run_cli(table_name):
     if not connection:
         return
 
-    # Gather metrics and initialize patterns
-    table_info = gather_metrics(connection, table_name)
-
-    initialize_patterns(connection, table_name, table_info)
+    # Gather metrics and initialize patterns (reused if this table was opened before and has not changed)
+    try:
+        session = get_session(connection, table_name)
+    except MySQLError as err:
+        print(f"Database error: {err}")
+        session = None
+    if session is None:
+        print(f"Table '{table_name}' does not exist or could not be profiled.")
+        connection.close()
+        return
 
     # print("Welcome to ChatDB CLI! Type your query or 'exit' to quit.")
     while True:
@@ -36,28 +90,31 @@ def run_cli(table_name):
         if user_input in ['exit', 'quit']:
             break
 
-        query, description = parse_query_nltk(user_input)
+        query, description = session.parse(user_input)
         if query:
             print(f"Generated SQL Query: {query}")
-            result = execute_query(connection, query)
+            result = stream_query(connection, query, table_name, RowWindow())
 
             if result:
-                # Handle queries with multiple rows (e.g., GROUP BY or LIMIT)
-                if isinstance(result, list):  # Check if result is a list of rows
-                    for row in result:
-                        # Print each row (e.g., for top 5 students)
+                # Print each row (e.g., for top 5 students); long results only show their first and last rows
+                first_rows, last_rows = result.shown()
+                for row in first_rows:
+                    print(f"{row[0]}: {row[1]}")
+                if result.truncated:
+                    print("...")
+                    for row in last_rows:
                         print(f"{row[0]}: {row[1]}")
-                else:
-                    # Single result, handle as before
-                    print(f"{result[0]}")
+                    print(f"{result.count} row(s) in set")
 
-                # Log the query and result
-                log_query(query, result)
+                # Log the query and the rows shown
+                log_query(query, first_rows + last_rows)
             else:
                 print("No matching records found.")
         else:
             print(description)
 
+    print(f"Parse cache: {PARSE_CACHE.summary()}")
+    print(f"Result cache: {RESULT_CACHE.summary()}")
     connection.close()
     # print("Database connection closed.")
 
@@ -1,11 +1,8 @@
-from ask.mysql_ask.mysql_helpers import gather_metrics
-from ask.mysql_ask.mysql_globals import FIELD_MAPPING, KNOWN_STORE_LOCATIONS, PATTERNS
+from ask.mysql_ask.mysql_query_parser import PATTERN_HANDLERS
 import re
-
-# Declare global variables for shared state
-# FIELD_MAPPING = {}
-# KNOWN_STORE_LOCATIONS = {}
-# PATTERNS = {}
+from utils.nlp import compile_dispatch
+from utils.phrase_matcher import PhraseMatcher
+from utils.metrics_cache import schema_fingerprint
 
 def generate_column_keywords(table_info):
     """Dynamically generate synonyms for each column."""
@@ -66,35 +63,32 @@ def generate_keywords(column_name, keyword_patterns):
     return list(set(synonyms))
 
 
-def initialize_patterns(connection, table_name, table_info):
-    """Dynamically initialize patterns based on table schema."""
-    global FIELD_MAPPING, PATTERNS, KNOWN_STORE_LOCATIONS
-
-    # Step 1: Gather table metrics
-    # table_info = gather_metrics(connection, table_name)
-    ## END TO BE REMOVED
+def initialize_patterns(session):
+    """Dynamically initialize the patterns of a session based on its table schema."""
+    table_name = session.table_name
+    field_mapping = session.field_mapping
 
-    # Step 2: Generate column keywords and populate FIELD_MAPPING
-    column_keywords = generate_column_keywords(table_info)
+    # Step 1: Generate column keywords and populate the field mapping
+    column_keywords = generate_column_keywords(session.table_info)
     # print(f"COLUMN KEYWORDS:\n{column_keywords}")
 
     for column, synonyms in column_keywords.items():
         for synonym in synonyms:
-            FIELD_MAPPING[synonym] = column  # Map each synonym to its corresponding column
-
-    # Step 3: Fetch dynamic fields (AFTER FIELD_MAPPING is populated)
-    quantity_field = FIELD_MAPPING.get("quantity", "1")  # Fallback to default
-    price_field = FIELD_MAPPING.get("price", "unit_price")  # Fallback to default
-    product_field = FIELD_MAPPING.get("product", "product")
-    product_type_field = FIELD_MAPPING.get("type", "product_type")
-    song_field = FIELD_MAPPING.get("song", "track")  # Correct fallback to "track"
-    stream_field = FIELD_MAPPING.get("streams", "streams")
-    name_field = FIELD_MAPPING.get("name", "artist")
-    score_field = FIELD_MAPPING.get("score", "gpa")
-    gender_field = FIELD_MAPPING.get("gender", "gender")
-    department_field = FIELD_MAPPING.get("department", "Department")
-    date_field = FIELD_MAPPING.get("date", "date")
-    category_field = FIELD_MAPPING.get("category", "category")
+            field_mapping[synonym] = column  # Map each synonym to its corresponding column
+
+    # Step 2: Fetch dynamic fields (AFTER the field mapping is populated)
+    quantity_field = field_mapping.get("quantity", "1")  # Fallback to default
+    price_field = field_mapping.get("price", "unit_price")  # Fallback to default
+    product_field = field_mapping.get("product", "product")
+    product_type_field = field_mapping.get("type", "product_type")
+    song_field = field_mapping.get("song", "track")  # Correct fallback to "track"
+    stream_field = field_mapping.get("streams", "streams")
+    name_field = field_mapping.get("name", "artist")
+    score_field = field_mapping.get("score", "gpa")
+    gender_field = field_mapping.get("gender", "gender")
+    department_field = field_mapping.get("department", "Department")
+    date_field = field_mapping.get("date", "date")
+    category_field = field_mapping.get("category", "category")
     # Debug the fetched fields
     # print(
     #     f"Quantity Field: {quantity_field}, Price Field: {price_field}, Name Field: {name_field}"
@@ -103,7 +97,7 @@ def initialize_patterns(connection, table_name, table_info):
     # )
 
     # Check for missing fields and warn
-    if "quantity" not in FIELD_MAPPING or "price" not in FIELD_MAPPING:
+    if "quantity" not in field_mapping or "price" not in field_mapping:
         print("Warning: Missing 'quantity' or 'price' field in FIELD_MAPPING. Using defaults.")
 
     # Define static patterns (no placeholders here)
@@ -266,7 +260,30 @@ def initialize_patterns(connection, table_name, table_info):
                 .replace("{category_field}", category_field)
             }
 
-    # Update PATTERNS globally
-    PATTERNS.update(updated_patterns)
+    session.patterns.update(updated_patterns)
+    compile_patterns(session)
+    build_phrase_index(session)
+    session.registry["schema_version"] = schema_fingerprint('mysql', table_name, session.table_info, field_mapping,
+                                                            session.known_store_locations)
 
     # print("Patterns initialized dynamically based on table schema.")
+
+
+def compile_patterns(session):
+    """Compile every pattern once and pair it with its handler, in pattern order (the first match wins)."""
+    entries = []
+    dispatch = []
+    for pattern_key, pattern_details in session.patterns.items():
+        pattern_details["regex"] = re.compile(pattern_details["pattern"], re.IGNORECASE)
+        entries.append((pattern_key, pattern_details["regex"], PATTERN_HANDLERS.get(pattern_key)))
+        dispatch.append(compile_dispatch(pattern_details["pattern"]))
+
+    session.registry["entries"] = entries
+    session.registry["dispatch"] = dispatch
+
+
+def build_phrase_index(session):
+    """Build the matchers for multi-word synonyms and store locations once the mappings are final."""
+    session.phrase_index["field_phrases"] = PhraseMatcher(
+        {phrase: column for phrase, column in session.field_mapping.items() if " " in phrase})
+    session.phrase_index["locations"] = PhraseMatcher(session.known_store_locations)
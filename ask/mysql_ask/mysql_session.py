@@ -0,0 +1,81 @@
+import threading
+from ask.mysql_ask.mysql_globals import PROFILE_LOCKS, SESSIONS, SESSIONS_LOCK
+from ask.mysql_ask.mysql_helpers import gather_metrics
+from ask.mysql_ask.mysql_patterns import initialize_patterns
+from ask.mysql_ask.mysql_query_parser import parse_query_nltk
+from utils.metrics_cache import mysql_table_version, schema_fingerprint
+
+
+class MySQLSession:
+    """Natural-language parser state of one table: its field mapping, store locations and compiled patterns.
+
+    Built once from the table profile and only read while parsing, so sessions of different tables can
+    answer questions concurrently.
+    """
+
+    def __init__(self, table_name, profile):
+        self.table_name = table_name
+        self.table_info = profile['table_info']
+        self.profile_version = schema_fingerprint(profile)
+        # mysql_table_version the session was last checked at, set by get_session
+        self.table_version = None
+        # Copies: the patterns add synonyms, and the profile is shared through the metrics cache
+        self.field_mapping = dict(profile['field_mapping'])
+        self.known_store_locations = dict(profile['known_store_locations'])
+        self.patterns = {}
+        # Compiled patterns: 'entries' is [(pattern_key, compiled regex, handler)] in match order, 'dispatch' the
+        # regexes that pick an entry (see compile_dispatch), 'schema_version' fingerprints what they were built from
+        self.registry = {"entries": [], "dispatch": [], "schema_version": None}
+        # Phrase matchers over the multi-word synonyms and the store locations
+        self.phrase_index = {"field_phrases": None, "locations": None}
+        initialize_patterns(self)
+
+    def parse(self, user_input):
+        return parse_query_nltk(user_input, self)
+
+
+def warm_session(table_name, version):
+    with SESSIONS_LOCK:
+        session = SESSIONS.get(table_name)
+    return session if session is not None and session.table_version == version else None
+
+
+def profile_lock(table_name):
+    with SESSIONS_LOCK:
+        return PROFILE_LOCKS.setdefault(table_name, threading.Lock())
+
+
+def get_session(connection, table_name, version=None):
+    """Warm session of `table_name`, rebuilt only when the table's profile has changed; None if the table does
+    not exist or cannot be profiled.
+
+    `version` is the table's mysql_table_version when the caller has already read it. While it is unchanged
+    the warm session is returned without touching the profile.
+    """
+    if version is None:
+        cursor = connection.cursor()
+        try:
+            version = mysql_table_version(cursor, table_name)
+        finally:
+            cursor.close()
+    session = warm_session(table_name, version)
+    if session is not None:
+        return session
+    if version[0] is None:
+        return None
+    with profile_lock(table_name):
+        # Another request may have profiled the table while this one waited
+        session = warm_session(table_name, version)
+        if session is not None:
+            return session
+        profile = gather_metrics(connection, table_name)
+        if profile is None:
+            return None
+        with SESSIONS_LOCK:
+            session = SESSIONS.get(table_name)
+        if session is None or session.profile_version != schema_fingerprint(profile):
+            session = MySQLSession(table_name, profile)
+        session.table_version = version
+        with SESSIONS_LOCK:
+            SESSIONS[table_name] = session
+    return session
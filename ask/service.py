@@ -0,0 +1,220 @@
+"""Local HTTP/JSON service answering natural-language questions, for both backends (standard library only).
+
+Usage: python -m ask.service [--host 127.0.0.1] [--port 8000] [--verbose]
+
+    POST /ask     {"db_type": "mysql"|"mongodb", "table": "<table or collection>", "question": "...",
+                   "execute": true, "max_rows": 100}
+                  -> {"query", "description", "row_count", "rows"}; "execute": false only parses
+    GET  /stats   parse/result cache, warm sessions and connection pool statistics
+    GET  /health  {"status": "ok"}
+
+Every request runs on its own thread. Table profiles, compiled patterns (sessions), the parse and result
+caches and the connection pools live for the whole process. A request on a warm table only reads its cheap
+version (table statistics / collStats); the first question on a table profiles it once, while concurrent
+requests on that table wait for it. Unknown tables are a 404, unreachable databases a 503, invalid bodies a 400.
+"""
+import argparse
+import json
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from pymongo.errors import ConnectionFailure
+from pymysql.err import InterfaceError, OperationalError
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+
+import config
+from utils.async_engine import run_query
+from utils.connect import CONNECTOR
+from utils.metrics_cache import mongo_collection_version, mysql_table_version
+from utils.result_cache import cached_result
+
+
+# MySQL server error of a full connection table; client-side connection errors are 2000-2999
+MYSQL_TOO_MANY_CONNECTIONS = 1040
+
+
+def unavailable(error):
+    """Whether a backend error means the database is unreachable or saturated (503) rather than a failed query (500)."""
+    if isinstance(error, (ConnectionFailure, InterfaceError, PoolTimeoutError)):
+        return True
+    # PyMySQL raises OperationalError for any unmapped server error too (unknown column...), so check the code
+    code = error.args[0] if isinstance(error, OperationalError) and error.args else None
+    return code == MYSQL_TOO_MANY_CONNECTIONS or (isinstance(code, int) and 2000 <= code < 3000)
+
+
+class RequestError(Exception):
+    """A request the service cannot answer, with the HTTP status to report."""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def mysql_answer(table_name, question, execute):
+    from ask.mysql_ask.mysql_helpers import connect_to_database
+    from ask.mysql_ask.mysql_session import get_session
+
+    connection = connect_to_database()
+    if connection is None:
+        raise RequestError(503, "Could not connect to MySQL.")
+    try:
+        cursor = connection.cursor()
+        try:
+            version = mysql_table_version(cursor, table_name)
+        finally:
+            cursor.close()
+        if version[0] is None:
+            raise RequestError(404, f"Table '{table_name}' does not exist.")
+        # Only the version is checked while the table is unchanged; the first request on it profiles it
+        session = get_session(connection, table_name, version)
+        if session is None:
+            raise RequestError(500, f"Table '{table_name}' could not be profiled.")
+        query, description = session.parse(question)
+    finally:
+        # Back to the pool before the query runs, which takes a connection of its own on the async engine
+        connection.close()
+    rows = None
+    if query and execute:
+        rows = cached_result('mysql', table_name, query, version, lambda: run_query('mysql', table_name, query))
+    return query, description, rows
+
+
+def mongo_answer(collection_name, question, execute):
+    from ask.mongo_ask.mongo_helpers_NLP import connect_to_db
+    from ask.mongo_ask.mongo_session_NLP import get_session
+
+    db = connect_to_db()
+    if db is None:
+        raise RequestError(503, "Could not connect to MongoDB.")
+    version = mongo_collection_version(db[collection_name])
+    # Only the version is checked while the collection is unchanged; the first request on it profiles it
+    session = get_session(db, collection_name, version) if version is not None else None
+    if session is None:
+        raise RequestError(404, f"Collection '{collection_name}' does not exist.")
+    query, description = session.parse(question)
+    rows = None
+    if query and execute:
+        rows = cached_result('mongodb', collection_name, query, version,
+                             lambda: run_query('mongodb', collection_name, query))
+    return query, description, rows
+
+
+def answer(request):
+    """Response body of a POST /ask request."""
+    db_type = request.get("db_type")
+    name = request.get("table") or request.get("collection")
+    question = request.get("question")
+    if db_type not in config.DBMS_OPTIONS or not isinstance(name, str) or not name \
+            or not isinstance(question, str) or not question:
+        raise RequestError(400, f"Expected db_type (one of {config.DBMS_OPTIONS}), table and question.")
+    execute = request.get("execute", True)
+    if not isinstance(execute, bool):
+        raise RequestError(400, "Expected execute to be true or false.")
+    max_rows = request.get("max_rows", config.SERVICE_MAX_ROWS)
+    # bool is an int subclass, so true/false are rejected explicitly
+    if isinstance(max_rows, bool) or not isinstance(max_rows, int) or max_rows < 0:
+        raise RequestError(400, "Expected max_rows to be a non-negative integer.")
+
+    backend = mysql_answer if db_type == 'mysql' else mongo_answer
+    query, description, rows = backend(name, question, execute)
+    if not query:
+        raise RequestError(422, description)
+    response = {"query": query, "description": description}
+    if execute:
+        response["row_count"] = len(rows)
+        response["rows"] = list(rows[:max_rows])
+    return response
+
+
+def stats():
+    from ask.mongo_ask import mongo_globals_NLP
+    from ask.mysql_ask import mysql_globals
+    from utils.result_cache import RESULT_CACHE
+
+    # Handler threads add sessions concurrently, so the names are copied under each module's lock
+    sessions = {}
+    for db_type, module in (("mysql", mysql_globals), ("mongodb", mongo_globals_NLP)):
+        with module.SESSIONS_LOCK:
+            sessions[db_type] = list(module.SESSIONS)
+    return {
+        "sessions": {db_type: sorted(names) for db_type, names in sessions.items()},
+        "parse_cache": {"mysql": mysql_globals.PARSE_CACHE.stats(), "mongodb": mongo_globals_NLP.PARSE_CACHE.stats()},
+        "result_cache": RESULT_CACHE.stats(),
+        "pools": CONNECTOR.pool_stats(),
+    }
+
+
+class QueryHandler(BaseHTTPRequestHandler):
+    verbose = False
+
+    def send_json(self, status, body):
+        payload = json.dumps(body, default=str).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):
+        if self.path == "/health":
+            self.send_json(200, {"status": "ok"})
+        elif self.path == "/stats":
+            self.send_json(200, stats())
+        else:
+            self.send_json(404, {"error": f"Unknown path {self.path}"})
+
+    def do_POST(self):
+        if self.path != "/ask":
+            self.send_json(404, {"error": f"Unknown path {self.path}"})
+            return
+        try:
+            try:
+                length = int(self.headers.get("Content-Length", 0))
+                request = json.loads(self.rfile.read(length) or b"{}")
+            except ValueError as e:
+                raise RequestError(400, f"Invalid request: {e}")
+            if not isinstance(request, dict):
+                raise RequestError(400, "Expected a JSON object.")
+            self.send_json(200, answer(request))
+        except RequestError as e:
+            self.send_json(e.status, {"error": str(e)})
+        except Exception as e:
+            self.send_json(503 if unavailable(e) else 500, {"error": f"{type(e).__name__}: {e}"})
+
+    def log_message(self, format, *args):
+        # Per-request logging is off by default so load tests are not bound by the terminal
+        if self.verbose:
+            super().log_message(format, *args)
+
+
+class QueryServer(ThreadingHTTPServer):
+    # The default listen backlog of 5 drops connections under a burst of clients (they retry a second later)
+    request_queue_size = config.SERVICE_BACKLOG
+    daemon_threads = True
+
+
+def serve(host=None, port=None, verbose=False):
+    host = host or config.SERVICE_HOST
+    port = port or config.SERVICE_PORT
+    QueryHandler.verbose = verbose
+    server = QueryServer((host, port), QueryHandler)
+    print(f"ChatDB query service listening on http://{host}:{server.server_port} (Ctrl+C to stop)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(f"Connection pools: {CONNECTOR.pool_summary()}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve natural-language queries over HTTP/JSON.")
+    parser.add_argument("--host", default=config.SERVICE_HOST)
+    parser.add_argument("--port", type=int, default=config.SERVICE_PORT)
+    parser.add_argument("--verbose", action="store_true", help="log every request")
+    args = parser.parse_args()
+    serve(args.host, args.port, args.verbose)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""Compare the MySQL ingest engines on the bundled datasets scaled up.
+
+Usage: python benchmarks/ingest_benchmark.py [--scale 1000] [--engines to_sql load_data]
+
+Each datasets/*.csv file is repeated --scale times into a temporary CSV and
+pushed once per engine into a '<name>_bench' table, which is dropped afterwards.
+"""
+import argparse
+import glob
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text
+from db_pusher import DatasetPusher
+from utils.connect import DatabaseConnector
+
+
+def build_scaled_csv(dataset_file, scale, directory):
+    """Write the dataset's rows `scale` times under a '<name>_bench.csv' file."""
+    name = os.path.splitext(os.path.basename(dataset_file))[0]
+    scaled_file = os.path.join(directory, f"{name}_bench.csv")
+    with open(dataset_file, 'r', encoding='utf-8') as source:
+        header = source.readline()
+        body = source.read()
+    if not body.endswith("\n"):
+        body += "\n"
+    with open(scaled_file, 'w', encoding='utf-8') as target:
+        target.write(header)
+        for _ in range(scale):
+            target.write(body)
+    return scaled_file
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark MySQL ingest engines.")
+    parser.add_argument("--scale", type=int, default=1000, help="How many times each dataset is repeated.")
+    parser.add_argument("--engines", nargs="+", default=["to_sql", "load_data"])
+    args = parser.parse_args()
+
+    connections = DatabaseConnector()
+    connections.connect_mysql()
+    engine = connections.connections[0]
+    pusher = DatasetPusher()
+
+    datasets_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "datasets")
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        for dataset_file in sorted(glob.glob(os.path.join(datasets_dir, "*.csv"))):
+            scaled_file = build_scaled_csv(dataset_file, args.scale, directory)
+            table_name = os.path.splitext(os.path.basename(scaled_file))[0]
+            size_mb = os.path.getsize(scaled_file) / (1024 * 1024)
+            for ingest_engine in args.engines:
+                print(f"\n== {table_name} ({size_mb:.1f} MB) with {ingest_engine} ==")
+                start = time.perf_counter()
+                pusher.push_mysql(scaled_file, engine, stream=True, engine=ingest_engine)
+                elapsed = time.perf_counter() - start
+                with engine.connect() as conn:
+                    rows = conn.execute(text(f"SELECT COUNT(*) FROM `{table_name}`")).scalar()
+                    conn.execute(text(f"DROP TABLE `{table_name}`"))
+                    conn.commit()
+                results.append((table_name, ingest_engine, rows, elapsed))
+
+    print(f"\n{'table':<28}{'engine':<12}{'rows':>12}{'seconds':>10}{'rows/s':>12}")
+    for table_name, ingest_engine, rows, elapsed in results:
+        print(f"{table_name:<28}{ingest_engine:<12}{rows:>12}{elapsed:>10.2f}{rows / elapsed if elapsed > 0 else 0:>12.0f}")
+
+
+if __name__ == "__main__":
+    main()
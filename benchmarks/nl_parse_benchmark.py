@@ -0,0 +1,211 @@
+"""Time natural-language parsing and query building per query type, for the MySQL and MongoDB parsers.
+
+Usage: python benchmarks/nl_parse_benchmark.py [--repeat 2000]
+
+Patterns are initialized from a synthetic coffee-sales profile, so no database is needed.
+For every sample question it reports pattern matching (the old linear re.search over PATTERNS
+against the compiled registry) and, when the NLTK data is installed, the full parse_query_nltk.
+For the MongoDB pipeline templates it also compares the old json.dumps/replace/loads build
+with the precompiled build(). It also reports what opening the ask menu costs at startup and how long
+the old per-question NLTK preprocessing (tokenize, POS tag, reload the stopwords) takes compared with
+the cached keywords. The phrase lookups (multi-word synonyms, store locations) are timed as a
+linear substring scan against the phrase matcher for growing vocabularies.
+"""
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ask.mongo_ask import mongo_query_parser_NLP
+from ask.mongo_ask.mongo_session_NLP import MongoSession
+from ask.mysql_ask import mysql_query_parser
+from ask.mysql_ask.mysql_session import MySQLSession
+from utils.nlp import question_keywords
+from utils.phrase_matcher import PhraseMatcher
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+TABLE_NAME = "coffee_shop_sales"
+
+TABLE_INFO = {
+    'numeric': {'transaction_qty': {'min': 1, 'max': 8}, 'unit_price': {'min': 0.8, 'max': 45.0}},
+    'categorical': {
+        'store_location': {'unique_values': ["Lower Manhattan", "Hell's Kitchen", "Astoria"]},
+        'product_category': {'unique_values': ["Coffee", "Tea", "Bakery", "Drinking Chocolate"]},
+        'product_type': {'unique_values': ["Barista Espresso", "Brewed Chai tea", "Scone", "Hot chocolate"]},
+    },
+    'date': {'transaction_date': {'earliest': '2023-01-01', 'latest': '2023-06-30'}},
+    'others': ['transaction_id', 'store_id', 'product_id', 'product_detail'],
+}
+
+PROFILE = {'table_info': TABLE_INFO, 'field_mapping': {}, 'known_store_locations': {}}
+
+QUESTIONS = [
+    "total sales by category",
+    "total revenue for each store location",
+    "total sales in January, 2023",
+    "total sales in 2023",
+    "top 5 best-selling products",
+    "top 3 least selling products",
+    "sales of Scone",
+    "average price by category",
+    "count of products",
+    "list of categories",
+    "find product where location is astoria",
+    "most expensive product",
+    "maximum value of unit_price",
+    "what is the weather like today",
+]
+
+# (template, params) of the MongoDB pipelines that get placeholders bound at parse time
+MONGO_BUILDS = [
+    ("total_sales_by_field", None, {"group_field": "product_category"}),
+    ("top_best_selling_products", None, {"group_field": "product_type", "limit": 5}),
+    ("specific_product_sales", None, {"group_field": "product_type"}),
+    ("total_sales_by_date", "specific_date", {"date_field": "transaction_date", "specific_date": "2023-01-01"}),
+    ("simple_list", None, {"group_field": "product_category"}),
+    ("maximum_value", None, {"field_name": "unit_price"}),
+]
+
+LEGACY_TOKENS = {"group_field": "{GROUP_FIELD}", "field_name": "{FIELD_NAME}", "limit": "{LIMIT}",
+                 "date_field": "{DATE_FIELD}", "specific_date": "{SPECIFIC_DATE}"}
+
+
+def legacy_match(patterns, question):
+    """The previous matching: compile-and-search every pattern in order."""
+    for pattern_key, pattern_details in patterns.items():
+        if re.search(pattern_details["pattern"], question, re.IGNORECASE):
+            return pattern_key
+    return None
+
+
+def legacy_build(template, params):
+    """The previous building: serialize the template, replace the placeholders as text, parse it back."""
+    pipeline_json = json.dumps(template)
+    for name, value in params.items():
+        pipeline_json = pipeline_json.replace(LEGACY_TOKENS[name], str(value))
+    return json.loads(pipeline_json)
+
+
+def legacy_keywords(user_input):
+    """The previous preprocessing: tokenize, POS tag and load the stopwords for every question."""
+    import nltk
+    from nltk.corpus import stopwords
+    tagged = nltk.pos_tag(nltk.word_tokenize(user_input.lower()))
+    stop_words = set(stopwords.words('english'))
+    return [word for word, pos in tagged if word not in stop_words]
+
+
+def import_seconds(module):
+    """Wall time of importing `module` in a fresh interpreter."""
+    code = f"import time; start = time.perf_counter(); import {module}; print(time.perf_counter() - start)"
+    output = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True).stdout
+    return float(output.strip())
+
+
+def per_call_us(function, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        function()
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+def nltk_available(parse):
+    try:
+        parse("total sales by category")
+        return True
+    except LookupError:
+        return False
+
+
+def benchmark_parser(label, parser_module, session, repeat):
+    patterns = session.patterns
+    registry = session.registry
+    parse = session.parse
+    full_parse = nltk_available(parse)
+    print(f"\n== {label} ==")
+    if not full_parse:
+        print("(NLTK data not installed: timing pattern matching only)")
+    print(f"{'question':<42}{'pattern':<28}{'linear us':>11}{'compiled us':>13}{'parse us':>10}")
+    for question in QUESTIONS:
+        entries = registry["entries"]
+        index = parser_module.first_matching_entry(registry, question)
+        pattern_key = entries[index][0] if index is not None else None
+        assert pattern_key == legacy_match(patterns, question), question
+
+        linear = per_call_us(lambda: legacy_match(patterns, question), repeat)
+        compiled = per_call_us(lambda: parser_module.first_matching_entry(registry, question), repeat)
+        if full_parse:
+            parsed = f"{per_call_us(lambda: parse(question), max(repeat // 20, 1)):>10.1f}"
+        else:
+            parsed = f"{'-':>10}"
+        print(f"{question:<42}{str(pattern_key):<28}{linear:>11.1f}{compiled:>13.1f}{parsed}")
+
+
+def benchmark_mongo_builds(session, repeat):
+    print("\n== MongoDB pipeline templates ==")
+    print(f"{'template':<40}{'json round-trip us':>20}{'compiled us':>13}")
+    for pattern_key, variant, params in MONGO_BUILDS:
+        template = session.patterns[pattern_key]["mongodb"]
+        build = session.patterns[pattern_key]["build"]
+        if variant:
+            template, build = template[variant], build[variant]
+        legacy = per_call_us(lambda: legacy_build(template, params), repeat)
+        compiled = per_call_us(lambda: build(params), repeat)
+        name = f"{pattern_key}/{variant}" if variant else pattern_key
+        print(f"{name:<40}{legacy:>20.1f}{compiled:>13.1f}")
+
+
+def benchmark_nltk(repeat):
+    print("\n== NLTK loading ==")
+    print(f"import ask.ask_branch (CLI startup): {import_seconds('ask.ask_branch') * 1000:.0f} ms")
+    print(f"import nltk (now deferred to the first question): {import_seconds('nltk') * 1000:.0f} ms")
+    question = QUESTIONS[0]
+    try:
+        question_keywords(question)
+        legacy_keywords(question)
+    except LookupError:
+        print("(NLTK data not installed: per-question preprocessing not timed)")
+        return
+    legacy = per_call_us(lambda: legacy_keywords(question), repeat)
+    cached = per_call_us(lambda: question_keywords(question), repeat)
+    print(f"per question: tokenize+tag+stopwords {legacy:.1f} us, cached keywords {cached:.1f} us")
+
+
+def benchmark_phrase_lookup(repeat):
+    print("\n== Store-location lookup ==")
+    print(f"{'locations':>10}{'linear scan us':>16}{'matcher us':>12}")
+    keywords = "total revenue store_location lower manhattan"
+    for size in (10, 1000, 10000):
+        locations = {f"store {index} street": f"Store {index} Street" for index in range(size)}
+        locations["lower manhattan"] = "Lower Manhattan"
+        matcher = PhraseMatcher(locations)
+        linear_first = lambda: next((value for key, value in locations.items() if key in keywords), None)
+        assert linear_first() == matcher.first(keywords)
+        linear = per_call_us(linear_first, repeat)
+        matched = per_call_us(lambda: matcher.first(keywords), repeat)
+        print(f"{size:>10}{linear:>16.1f}{matched:>12.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark NL parsing and query building per query type.")
+    parser.add_argument("--repeat", type=int, default=2000)
+    args = parser.parse_args()
+
+    mysql_session = MySQLSession(TABLE_NAME, PROFILE)
+    mongo_session = MongoSession(TABLE_NAME, PROFILE)
+
+    benchmark_parser("MySQL", mysql_query_parser, mysql_session, args.repeat)
+    benchmark_parser("MongoDB", mongo_query_parser_NLP, mongo_session, args.repeat)
+    benchmark_mongo_builds(mongo_session, args.repeat)
+    benchmark_phrase_lookup(max(args.repeat // 20, 1))
+    benchmark_nltk(max(args.repeat // 20, 1))
+
+
+if __name__ == "__main__":
+    main()
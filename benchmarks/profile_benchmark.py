@@ -0,0 +1,124 @@
+"""Compare the single-pass column profiler with the old per-column queries on a wide table.
+
+Usage: python benchmarks/profile_benchmark.py [--columns 60] [--rows 100000] [--repeat 3]
+
+A '<prefix>_wide' table with a mix of integer, float, text and date columns is
+created, profiled both ways, checked for identical results and dropped.
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import config
+from sqlalchemy import text
+from generate.sql_helpers import gather_sql_metrics
+from utils.connect import DatabaseConnector
+from utils.metrics_cache import invalidate_metrics
+
+
+def legacy_gather_sql_metrics(connection, table_name):
+    """The previous implementation: one COUNT(DISTINCT) plus one MIN/MAX or DISTINCT query per column."""
+    raw_connection = connection.raw_connection()
+    cursor = raw_connection.cursor()
+    cursor.execute(f"SELECT COLUMN_NAME, DATA_TYPE FROM information_schema.columns WHERE table_name = '{table_name}';")
+    schema = cursor.fetchall()
+    cursor.execute(f"SELECT COUNT(*) FROM {table_name};")
+    total_rows = cursor.fetchone()[0]
+
+    table_info = {'numeric': {}, 'categorical': {}, 'date': {}, 'others': []}
+    numeric_types = ['int', 'bigint', 'float', 'double', 'decimal']
+    for column, data_type in schema:
+        cursor.execute(f"SELECT COUNT(DISTINCT `{column}`) FROM {table_name};")
+        unique_values_count = cursor.fetchone()[0]
+        unique_value_proportion = unique_values_count / total_rows if total_rows > 0 else 0
+        if "id" in column.lower() or unique_values_count == 1:
+            table_info['others'].append(column)
+            continue
+        if data_type in numeric_types and ("price" in column.lower() or "qty" in column.lower() or "quantity" in column.lower() or unique_value_proportion >= config.NUMERIC_UNIQUE):
+            cursor.execute(f"SELECT MIN(`{column}`), MAX(`{column}`) FROM {table_name};")
+            min_value, max_value = cursor.fetchone()
+            table_info['numeric'][column] = {'min': min_value, 'max': max_value}
+        elif 'date' in data_type or 'time' in data_type:
+            cursor.execute(f"SELECT MIN(`{column}`), MAX(`{column}`) FROM {table_name};")
+            earliest, latest = cursor.fetchone()
+            table_info['date'][column] = {'earliest': earliest, 'latest': latest}
+        elif unique_value_proportion >= config.OTHERS_UNQIUE:
+            table_info['others'].append(column)
+        else:
+            cursor.execute(f"SELECT DISTINCT `{column}` FROM {table_name};")
+            table_info['categorical'][column] = {'unique_values': [row[0] for row in cursor.fetchall()]}
+    cursor.close()
+    return table_info
+
+
+def uncached_gather_sql_metrics(connection, table_name):
+    """Drop the cached profile first so every repetition profiles the table again."""
+    invalidate_metrics('mysql', table_name)
+    return gather_sql_metrics(connection, table_name)
+
+
+def build_wide_frame(columns, rows):
+    """Build a frame cycling through numeric, categorical, text and date columns."""
+    rng = np.random.default_rng(42)
+    data = {}
+    for index in range(columns):
+        kind = index % 4
+        if kind == 0:
+            data[f"amount_{index}"] = rng.integers(0, rows, rows)
+        elif kind == 1:
+            data[f"score_{index}"] = rng.random(rows).round(4)
+        elif kind == 2:
+            data[f"label_{index}"] = rng.choice([f"group {value}" for value in range(20)], rows)
+        else:
+            data[f"event_date_{index}"] = pd.Timestamp("2020-01-01") + pd.to_timedelta(rng.integers(0, 1500, rows), unit="D")
+    return pd.DataFrame(data)
+
+
+def time_call(function, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return result, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark gather_sql_metrics on a wide table.")
+    parser.add_argument("--columns", type=int, default=60)
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--prefix", default="bench")
+    args = parser.parse_args()
+
+    connections = DatabaseConnector()
+    connections.connect_mysql()
+    engine = connections.connections[0]
+    table_name = f"{args.prefix}_wide"
+
+    print(f"Creating {table_name} with {args.columns} columns and {args.rows} rows...")
+    build_wide_frame(args.columns, args.rows).to_sql(table_name, engine, if_exists='replace', index=False,
+                                                     method='multi', chunksize=config.INSERT_BATCH_SIZE)
+    try:
+        legacy_info, legacy_time = time_call(lambda: legacy_gather_sql_metrics(engine, table_name), args.repeat)
+        single_pass_info, single_pass_time = time_call(lambda: uncached_gather_sql_metrics(engine, table_name), args.repeat)
+    finally:
+        with engine.connect() as conn:
+            conn.execute(text(f"DROP TABLE `{table_name}`"))
+            conn.commit()
+
+    print(f"per-column queries: {legacy_time:.3f}s")
+    print(f"single-pass profile: {single_pass_time:.3f}s")
+    print(f"speedup: {legacy_time / single_pass_time if single_pass_time > 0 else float('inf'):.1f}x")
+    print(f"identical table_info: {legacy_info == single_pass_info}")
+
+
+if __name__ == "__main__":
+    main()
@@ -14,5 +14,97 @@ MYSQL_CONFIG = {
 
 MONGODB_URI = os.getenv('MONGODB_URI')
 
+# Pooled MySQL connections kept open by the shared engine (utils/connect.py)
+MYSQL_POOL_SIZE = int(os.getenv('MYSQL_POOL_SIZE', '5'))
+# Extra MySQL connections opened past the pool size under load, closed again when returned
+MYSQL_POOL_MAX_OVERFLOW = int(os.getenv('MYSQL_POOL_MAX_OVERFLOW', '10'))
+# Seconds after which a pooled MySQL connection is replaced, staying under the server's wait_timeout
+MYSQL_POOL_RECYCLE = int(os.getenv('MYSQL_POOL_RECYCLE', '3600'))
+# Check a pooled MySQL connection is alive before handing it out
+MYSQL_POOL_PRE_PING = True
+# Maximum connections of the shared MongoClient
+MONGO_POOL_SIZE = int(os.getenv('MONGO_POOL_SIZE', '20'))
+# Milliseconds an idle MongoDB connection stays in the pool
+MONGO_POOL_MAX_IDLE_MS = 300000
+
 NUMERIC_UNIQUE =  0.1
-OTHERS_UNQIUE = 0.46
\ No newline at end of file
+OTHERS_UNQIUE = 0.46
+
+# Rows read from the CSV per chunk when streaming a dataset into MySQL
+INGEST_CHUNK_SIZE = 50000
+# Rows packed into a single multi-row INSERT statement
+INSERT_BATCH_SIZE = 1000
+# Files at least this large are streamed in chunks instead of loaded at once
+STREAMING_INGEST_MIN_BYTES = 100 * 1024 * 1024
+# MySQL ingest engine: 'to_sql' (pandas inserts) or 'load_data' (LOAD DATA LOCAL INFILE)
+MYSQL_INGEST_ENGINE = os.getenv('MYSQL_INGEST_ENGINE', 'to_sql')
+# Allow the client side of LOAD DATA LOCAL INFILE (the server must allow it as well)
+MYSQL_LOCAL_INFILE = True
+# Documents per unordered insert_many call when uploading to MongoDB
+MONGO_INSERT_BATCH_SIZE = 1000
+# Insert batches kept in flight concurrently (1 inserts serially)
+MONGO_INSERT_WORKERS = 4
+
+# Distinct counts used to classify columns: 'exact' (COUNT(DISTINCT) / distinct) or 'approx' (HyperLogLog)
+DISTINCT_MODE = os.getenv('DISTINCT_MODE', 'exact')
+# Target standard error of the approximate distinct counts
+HLL_ERROR = 0.01
+# Documents fetched per round trip when sketching MongoDB fields client-side
+HLL_SCAN_BATCH_SIZE = 5000
+
+# Profiling mode for table/collection metrics: 'full' reads everything, 'sample' profiles a random sample
+PROFILE_MODE = os.getenv('PROFILE_MODE', 'full')
+# Rows/documents profiled per table or collection in 'sample' mode
+PROFILE_SAMPLE_SIZE = 100000
+# Random key ranges a MySQL sample is read from when the table has an indexed integer key
+PROFILE_SAMPLE_RANGES = 100
+
+# Reuse table/collection metrics across sessions until the data changes
+METRICS_CACHE_ENABLED = True
+# Directory holding the persisted metrics
+METRICS_CACHE_DIR = os.getenv('METRICS_CACHE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), '.chatdb_cache'))
+
+# Connections used to run per-column profiling queries concurrently (1 runs them serially on one cursor)
+PROFILE_WORKERS = int(os.getenv('PROFILE_WORKERS', '1'))
+
+# Parsed natural-language questions remembered per table schema (0 disables the parse cache)
+PARSE_CACHE_SIZE = int(os.getenv('PARSE_CACHE_SIZE', '256'))
+
+# Results of read-only natural-language queries reused while the table is unchanged (0 disables the result cache)
+RESULT_CACHE_SIZE = int(os.getenv('RESULT_CACHE_SIZE', '128'))
+# Seconds a cached result is trusted; bounds staleness when a write is not visible in the table statistics
+RESULT_CACHE_TTL = float(os.getenv('RESULT_CACHE_TTL', '300'))
+# Results with more rows/documents than this are not cached
+RESULT_CACHE_MAX_ROWS = 10000
+
+# Distinct queries of a batch run (python -m ask.batch) kept in flight at once on the async engine
+BATCH_WORKERS = int(os.getenv('BATCH_WORKERS', '4'))
+
+# Rows fetched per round trip when streaming a MySQL result from a server-side cursor
+STREAM_FETCH_SIZE = 1000
+# Results up to this many rows are printed whole; longer ones print their first and last rows only
+PRINT_MAX_ROWS = 30
+# Leading rows printed for a longer result
+PRINT_HEAD_ROWS = 10
+# Trailing rows printed for a longer result
+PRINT_TAIL_ROWS = 5
+# MongoDB results up to this many documents are printed whole (and fetched in one batch)
+MONGO_PRINT_MAX_DOCS = 15
+# Leading documents printed for a longer MongoDB result, followed by its total count
+MONGO_PRINT_HEAD_DOCS = 7
+
+# Queries generated per table/collection by "Generate Random Queries" when no count is entered
+GENERATE_QUERY_COUNT = 5
+# Generated queries run concurrently, each on its own pooled connection (stay within the MySQL pool size)
+GENERATE_WORKERS = int(os.getenv('GENERATE_WORKERS', '4'))
+
+# Queries the shared async engine (utils/async_engine.py) keeps in flight at once, across all callers
+ASYNC_MAX_IN_FLIGHT = int(os.getenv('ASYNC_MAX_IN_FLIGHT', '10'))
+
+# Address of the HTTP/JSON query service (python -m ask.service); local only by default
+SERVICE_HOST = os.getenv('SERVICE_HOST', '127.0.0.1')
+SERVICE_PORT = int(os.getenv('SERVICE_PORT', '8000'))
+# Rows/documents returned per answer by the service unless the request sets max_rows
+SERVICE_MAX_ROWS = 1000
+# Pending connections the service queues while its threads accept them
+SERVICE_BACKLOG = 128
@@ -2,9 +2,17 @@ import pandas as pd
 from sqlalchemy import types
 import config
 import os
-from sqlalchemy.dialects.mysql import BIGINT
-from sqlalchemy import inspect, text
-from sqlalchemy.orm import sessionmaker
+import time
+import tempfile
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, as_completed, wait
+from pymysql.err import MySQLError
+from sqlalchemy.dialects.mysql import BIGINT, YEAR
+from utils.metrics_cache import invalidate_metrics
+from utils.result_cache import invalidate_results
+
+
+# MySQL error codes raised when LOAD DATA LOCAL INFILE is disabled on the client or server
+LOCAL_INFILE_DISABLED_ERRORS = (1148, 2068, 3948)
 
 
 class DatasetPusher:
@@ -12,11 +20,10 @@ class DatasetPusher:
         self.mysql_config = config.MYSQL_CONFIG
         self.mongodb_uri = config.MONGODB_URI
 
-    def push_mysql(self, dataset_file, connection):
-        df = pd.read_csv(dataset_file)
-        
-        # Detect appropriate column types based on column name
+    def detect_mysql_types(self, df):
+        """Detect MySQL column types from a sample frame and the conversions each column needs."""
         dtype_mapping = {}
+        converters = {}
         for column in df.columns:
             sample_value = str(df[column].dropna().iloc[0])
             if (len(sample_value) >= 1 and sample_value[0].isdigit() and "-" not in sample_value) or (len(sample_value) > 1 and sample_value[1].isdigit() and "-" not in sample_value[1:]):  # Check if the second char is a digit
@@ -26,28 +33,73 @@ class DatasetPusher:
                     dtype_mapping[column] = BIGINT
             elif 'date' in column.lower():
                 # Convert to DATETIME if it seems to contain both date and time information
-                if len(df[column].dropna().astype(str).iloc[0]) > 10:
-                    df[column] = pd.to_datetime(df[column], errors='coerce')
+                if len(sample_value) > 10:
+                    converters[column] = lambda values: pd.to_datetime(values, errors='coerce')
                     dtype_mapping[column] = types.DATETIME
                 else:
-                    df[column] = pd.to_datetime(df[column], errors='coerce').dt.date
+                    converters[column] = lambda values: pd.to_datetime(values, errors='coerce').dt.date
                     dtype_mapping[column] = types.DATE
             elif 'year' in column.lower():
                 # Convert to YEAR if length is appropriate, otherwise use DATE or DATETIME
-                if len(df[column].dropna().astype(str).iloc[0]) <= 5:
-                    df[column] = pd.to_datetime(df[column], errors='coerce').dt.year
-                    dtype_mapping[column] = types.YEAR
+                if len(sample_value) <= 5:
+                    converters[column] = lambda values: pd.to_datetime(values, errors='coerce').dt.year
+                    dtype_mapping[column] = YEAR
                 else:
-                    df[column] = pd.to_datetime(df[column], errors='coerce')
+                    converters[column] = lambda values: pd.to_datetime(values, errors='coerce')
                     dtype_mapping[column] = types.DATE
             elif 'time' in column.lower():
                 # Convert to TIME if the column contains only time values
-                if len(df[column].dropna().astype(str).iloc[0]) < 12:
-                    df[column] = pd.to_datetime(df[column], format='%I:%M:%S %p', errors='coerce')
+                if len(sample_value) < 12:
+                    converters[column] = lambda values: pd.to_datetime(values, format='%I:%M:%S %p', errors='coerce')
                     dtype_mapping[column] = types.TIME
                 else:
-                    df[column] = pd.to_datetime(df[column], errors='coerce')
+                    converters[column] = lambda values: pd.to_datetime(values, errors='coerce')
                     dtype_mapping[column] = types.DATETIME
+        return dtype_mapping, converters
+
+    def apply_converters(self, df, converters):
+        """Apply the column conversions returned by detect_mysql_types."""
+        for column, convert in converters.items():
+            df[column] = convert(df[column])
+        return df
+
+    def drop_incomplete_rows(self, df):
+        """Drop rows with a missing (NULL/NaN/NaT) value in any column, returning (df, dropped count)."""
+        complete = df.dropna()
+        return complete, len(df) - len(complete)
+
+    def drop_nan_rows(self, df):
+        """Drop rows with a float NaN in any column, returning (df, dropped count).
+
+        JSON nulls (None) are kept: MongoDB stores them as null, and only NaN documents were ever removed."""
+        has_nan = pd.Series(False, index=df.index)
+        for column in df.columns:
+            values = df[column]
+            if pd.api.types.is_float_dtype(values):
+                has_nan |= values.isna()
+            elif values.dtype == object:
+                has_nan |= values.map(lambda value: isinstance(value, float) and value != value)
+        return df[~has_nan], int(has_nan.sum())
+
+    def push_mysql(self, dataset_file, connection, stream=None, engine=None):
+        engine = engine or config.MYSQL_INGEST_ENGINE
+        if engine == 'load_data':
+            return self.push_mysql_bulk(dataset_file, connection)
+        elif engine != 'to_sql':
+            raise ValueError("Unsupported ingest engine. Use 'to_sql' or 'load_data'.")
+
+        # Large files are streamed in chunks so memory stays flat
+        if stream is None:
+            stream = os.path.getsize(dataset_file) >= config.STREAMING_INGEST_MIN_BYTES
+        if stream:
+            return self.push_mysql_streaming(dataset_file, connection)
+
+        df = pd.read_csv(dataset_file)
+        
+        # Detect appropriate column types based on column name
+        dtype_mapping, converters = self.detect_mysql_types(df)
+        df = self.apply_converters(df, converters)
+        df, dropped_rows = self.drop_incomplete_rows(df)
 
         # Extract table name from file name
         table_name = os.path.splitext(os.path.basename(dataset_file))[0]
@@ -55,78 +107,228 @@ class DatasetPusher:
         # Push the DataFrame to MySQL with detected column types
         df.to_sql(name=table_name, con=connection, if_exists='replace', index=False, dtype=dtype_mapping)
         
-        self.cleanup_null_rows(connection, table_name)
+        print(f"Deleted {dropped_rows} rows containing NULL values.")
+        print("Dataset pushed to MySQL successfully with appropriate data types.")
+        return dropped_rows
+
+    def push_mysql_streaming(self, dataset_file, connection, chunksize=None):
+        """Stream a CSV into MySQL chunk by chunk using multi-row inserts."""
+        chunksize = chunksize or config.INGEST_CHUNK_SIZE
+        table_name = os.path.splitext(os.path.basename(dataset_file))[0]
+
+        dtype_mapping, converters = None, None
+        total_rows = 0
+        dropped_rows = 0
+        start = time.perf_counter()
+        for chunk in pd.read_csv(dataset_file, chunksize=chunksize):
+            # Column types are inferred once from the first chunk and reused
+            if dtype_mapping is None:
+                dtype_mapping, converters = self.detect_mysql_types(chunk)
+                if_exists = 'replace'
+            else:
+                if_exists = 'append'
+            chunk = self.apply_converters(chunk, converters)
+            chunk, dropped = self.drop_incomplete_rows(chunk)
+            dropped_rows += dropped
+            chunk.to_sql(name=table_name, con=connection, if_exists=if_exists, index=False, dtype=dtype_mapping,
+                         method='multi', chunksize=config.INSERT_BATCH_SIZE)
+            total_rows += len(chunk)
+            elapsed = time.perf_counter() - start
+            print(f"Inserted {total_rows} rows ({total_rows / elapsed if elapsed > 0 else 0:.0f} rows/s)", end="\r")
+
+        elapsed = time.perf_counter() - start
+        print(f"\nStreamed {total_rows} rows into '{table_name}' in {elapsed:.2f}s "
+              f"({total_rows / elapsed if elapsed > 0 else 0:.0f} rows/s).")
+
+        print(f"Deleted {dropped_rows} rows containing NULL values.")
+        print("Dataset pushed to MySQL successfully with appropriate data types.")
+        return dropped_rows
+
+    def push_mysql_bulk(self, dataset_file, connection, chunksize=None):
+        """Bulk-load a CSV with LOAD DATA LOCAL INFILE, falling back to batched executemany."""
+        chunksize = chunksize or config.INGEST_CHUNK_SIZE
+        table_name = os.path.splitext(os.path.basename(dataset_file))[0]
+
+        dtype_mapping, converters = None, None
+        use_infile = True
+        total_rows = 0
+        dropped_rows = 0
+        start = time.perf_counter()
+        raw_connection = connection.raw_connection()
+        try:
+            for chunk in pd.read_csv(dataset_file, chunksize=chunksize):
+                if dtype_mapping is None:
+                    dtype_mapping, converters = self.detect_mysql_types(chunk)
+                    chunk = self.apply_converters(chunk, converters)
+                    # Create the empty table with the detected types, rows are loaded below
+                    chunk.head(0).to_sql(name=table_name, con=connection, if_exists='replace', index=False, dtype=dtype_mapping)
+                else:
+                    chunk = self.apply_converters(chunk, converters)
+                chunk, dropped = self.drop_incomplete_rows(chunk)
+                dropped_rows += dropped
+
+                if use_infile:
+                    try:
+                        self.load_data_infile(raw_connection, table_name, chunk, dtype_mapping)
+                    except MySQLError as err:
+                        if err.args[0] not in LOCAL_INFILE_DISABLED_ERRORS:
+                            raise
+                        print(f"LOAD DATA LOCAL INFILE is not allowed ({err.args[1]}). Falling back to batched inserts.")
+                        use_infile = False
+                if not use_infile:
+                    self.insert_rows(raw_connection, table_name, chunk)
+                raw_connection.commit()
+                total_rows += len(chunk)
+        finally:
+            raw_connection.close()
+
+        elapsed = time.perf_counter() - start
+        engine = "LOAD DATA LOCAL INFILE" if use_infile else "batched executemany"
+        print(f"Loaded {total_rows} rows into '{table_name}' with {engine} in {elapsed:.2f}s "
+              f"({total_rows / elapsed if elapsed > 0 else 0:.0f} rows/s).")
+
+        print(f"Deleted {dropped_rows} rows containing NULL values.")
         print("Dataset pushed to MySQL successfully with appropriate data types.")
+        return dropped_rows
+
+    def write_normalized_tsv(self, df, file, dtype_mapping=None):
+        """Write a frame as a TSV in the default LOAD DATA format (backslash escapes, \\N for NULL).
 
-    def push_mongodb(self, dataset_file, connection):
+        Values are formatted for the column types of `dtype_mapping` (from detect_mysql_types)."""
+        dtype_mapping = dtype_mapping or {}
+        fields = []
+        for column in df.columns:
+            values = df[column]
+            target = dtype_mapping.get(column)
+            if target is types.TIME and pd.api.types.is_datetime64_any_dtype(values):
+                # The TIME converter parses onto 1900-01-01; only the time of day belongs in the column
+                text_values = values.dt.strftime('%H:%M:%S')
+            elif target in (YEAR, BIGINT) and pd.api.types.is_float_dtype(values):
+                # Years and integers come back as floats once a NaN/NaT was coerced into the column
+                text_values = values.astype('Int64').astype(str)
+            elif values.dtype == bool:
+                text_values = values.astype(int).astype(str)
+            elif pd.api.types.is_datetime64_any_dtype(values):
+                text_values = values.dt.strftime('%Y-%m-%d %H:%M:%S')
+            else:
+                text_values = values.astype(str)
+            text_values = (text_values.str.replace("\\", "\\\\", regex=False)
+                           .str.replace("\t", "\\t", regex=False)
+                           .str.replace("\n", "\\n", regex=False)
+                           .str.replace("\r", "\\r", regex=False))
+            fields.append(text_values.mask(values.isna(), "\\N"))
+
+        lines = fields[0].str.cat(fields[1:], sep="\t") if len(fields) > 1 else fields[0]
+        for line in lines:
+            file.write(line + "\n")
+
+    def load_data_infile(self, raw_connection, table_name, df, dtype_mapping=None):
+        """Load one chunk through a temporary TSV file."""
+        with tempfile.NamedTemporaryFile('w', suffix='.tsv', delete=False, newline='', encoding='utf-8') as tmp:
+            self.write_normalized_tsv(df, tmp, dtype_mapping)
+        try:
+            columns = ", ".join(f"`{column}`" for column in df.columns)
+            cursor = raw_connection.cursor()
+            cursor.execute(
+                f"LOAD DATA LOCAL INFILE %s INTO TABLE `{table_name}` CHARACTER SET utf8mb4 "
+                f"FIELDS TERMINATED BY '\\t' LINES TERMINATED BY '\\n' ({columns});",
+                (tmp.name,))
+            cursor.close()
+        finally:
+            os.remove(tmp.name)
+
+    def insert_rows(self, raw_connection, table_name, df):
+        """Insert one chunk with executemany in INSERT_BATCH_SIZE batches."""
+        columns = ", ".join(f"`{column}`" for column in df.columns)
+        placeholders = ", ".join(["%s"] * len(df.columns))
+        insert_query = f"INSERT INTO `{table_name}` ({columns}) VALUES ({placeholders})"
+
+        rows = df.astype(object).where(pd.notna(df), None)
+        cursor = raw_connection.cursor()
+        for offset in range(0, len(rows), config.INSERT_BATCH_SIZE):
+            batch = rows.iloc[offset:offset + config.INSERT_BATCH_SIZE]
+            cursor.executemany(insert_query, list(batch.itertuples(index=False, name=None)))
+        cursor.close()
+
+    def read_dataset_chunks(self, dataset_file, chunksize):
+        """Yield the dataset as DataFrames of at most chunksize rows."""
         if dataset_file.endswith('.csv'):
-            df = pd.read_csv(dataset_file)
+            yield from pd.read_csv(dataset_file, chunksize=chunksize)
         elif dataset_file.endswith('.json'):
             df = pd.read_json(dataset_file)
+            for offset in range(0, len(df), chunksize):
+                yield df.iloc[offset:offset + chunksize]
         else:
             raise ValueError("Unsupported file format. Use CSV or JSON.")
+
+    def iter_record_batches(self, dataset_file, batch_size, drop_counts):
+        """Yield lists of at most batch_size documents without NaN, appending dropped row counts to drop_counts."""
+        for chunk in self.read_dataset_chunks(dataset_file, config.INGEST_CHUNK_SIZE):
+            chunk, dropped = self.drop_nan_rows(chunk)
+            drop_counts.append(dropped)
+            for offset in range(0, len(chunk), batch_size):
+                yield chunk.iloc[offset:offset + batch_size].to_dict('records')
+
+    def insert_batch(self, collection, documents):
+        """Insert one batch unordered and return (inserted count, latency in seconds)."""
+        start = time.perf_counter()
+        result = collection.insert_many(documents, ordered=False)
+        return len(result.inserted_ids), time.perf_counter() - start
+
+    def push_mongodb(self, dataset_file, connection, batch_size=None, workers=None):
+        if not (dataset_file.endswith('.csv') or dataset_file.endswith('.json')):
+            raise ValueError("Unsupported file format. Use CSV or JSON.")
+        batch_size = batch_size or config.MONGO_INSERT_BATCH_SIZE
+        workers = workers or config.MONGO_INSERT_WORKERS
         
         db_name = self.mysql_config['database']
         collection_name = os.path.splitext(os.path.basename(dataset_file))[0]
         db = connection[db_name]
         collection = db[collection_name]
-        collection.insert_many(df.to_dict('records'))
-
-        self.cleanup_nan_rows(connection, db_name, collection_name)
-
-        
-        print("Dataset pushed to MongoDB successfully.")
-
-
-    def cleanup_null_rows(self, engine, table_name):
-        try:
-            # Create a session
-            Session = sessionmaker(bind=engine)
-            session = Session()
-
-            # Inspect the table structure to get column names
-            inspector = inspect(engine)
-            columns = [col['name'] for col in inspector.get_columns(table_name)]
-
-            # Build the DELETE query
-            null_conditions = " OR ".join([f"{col} IS NULL" for col in columns])
-            delete_query = text(f"DELETE FROM {table_name} WHERE {null_conditions};")  # Use text() here
-
-            # Execute the query
-            result = session.execute(delete_query)
-            session.commit()
-
-            print(f"Deleted {result.rowcount} rows containing NULL values.")
-            return result.rowcount
-        except Exception as e:
-            print(f"Error: {e}")
-            return 0
-        finally:
-            session.close()
 
+        # Keep at most two batches per worker in flight so memory stays bounded
+        total_documents = 0
+        latencies = []
+        drop_counts = []
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            in_flight = set()
+            for documents in self.iter_record_batches(dataset_file, batch_size, drop_counts):
+                if len(in_flight) >= workers * 2:
+                    done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        inserted, latency = future.result()
+                        total_documents += inserted
+                        latencies.append(latency)
+                in_flight.add(executor.submit(self.insert_batch, collection, documents))
+            for future in as_completed(in_flight):
+                inserted, latency = future.result()
+                total_documents += inserted
+                latencies.append(latency)
+        elapsed = time.perf_counter() - start
 
-    def cleanup_nan_rows(self, connection, db_name, collection_name):
-        # Connect to the database and collection
-        db = connection[db_name]
-        collection = db[collection_name]
+        print(f"Inserted {total_documents} documents in {len(latencies)} batches of up to {batch_size} "
+              f"using {workers} worker(s) in {elapsed:.2f}s ({total_documents / elapsed if elapsed > 0 else 0:.0f} docs/s).")
+        if latencies:
+            latencies.sort()
+            print(f"Batch latency: avg {sum(latencies) / len(latencies) * 1000:.1f} ms, "
+                  f"p95 {latencies[int(0.95 * (len(latencies) - 1))] * 1000:.1f} ms, "
+                  f"max {latencies[-1] * 1000:.1f} ms")
 
-        # Query to match rows with NaN in any field
-        query = {
-            "$or": [
-                {field: {"$eq": float('NaN')}} for field in collection.find_one().keys() if field != "_id"
-            ]
-        }
-
-        # Delete matching rows
-        result = collection.delete_many(query)
-        
-        print(f"Deleted {result.deleted_count} documents containing NaN values.")
-        return result.deleted_count
+        dropped_rows = sum(drop_counts)
+        print(f"Deleted {dropped_rows} documents containing NaN values.")
+        print("Dataset pushed to MongoDB successfully.")
+        return dropped_rows
 
     def push_dataset(self, db_type, dataset_file, connections):
         if db_type == 'mysql':
-            self.push_mysql(dataset_file, connections[0])
+            result = self.push_mysql(dataset_file, connections[0])
         elif db_type == 'mongodb':
-            self.push_mongodb(dataset_file, connections[1])
+            result = self.push_mongodb(dataset_file, connections[1])
         else:
             raise ValueError("Unsupported db_type. Use 'mysql' or 'mongodb'.")
+        # The table/collection was replaced or appended to, so its cached metrics and query results are stale
+        name = os.path.splitext(os.path.basename(dataset_file))[0]
+        invalidate_metrics(db_type, name)
+        invalidate_results(db_type, name)
+        return result
@@ -4,7 +4,7 @@ from upload.upload import upload_dataset
 from explore.explore import explore_database
 from generate.generate_queries import generate_random_query
 from utils.common import get_db_type, select_table_or_collection
-from utils.connect import DatabaseConnector
+from utils.connect import CONNECTOR
 from drop.drop import delete_dataset
 from ask.ask_branch import branch_ask
 def natural_language_query(db_type, name):
@@ -12,6 +12,7 @@ def natural_language_query(db_type, name):
 
 # helper function to exit the program
 def exit_program():
+    print(f"Connection pools: {CONNECTOR.pool_summary()}")
     print("Exiting the program. Goodbye!")
     sys.exit()
 
@@ -26,7 +27,7 @@ def display_menu():
     print("6. Exit")
 
 def main():
-    connections = DatabaseConnector()
+    connections = CONNECTOR
     connections.connect_all()
     pusher = DatabasePusher()
     while True:
@@ -1,13 +1,21 @@
 from utils.common import select_table_or_collection
 import config
+from utils.metrics_cache import invalidate_metrics
+from utils.result_cache import invalidate_results
 
 def delete_mysql_dataset(connection):
     table_name = select_table_or_collection('mysql')
     if table_name:
-        cursor = connection.raw_connection().cursor()
-        cursor.execute(f"DROP TABLE {table_name};")
-        connection.raw_connection().commit()
-        cursor.close()
+        raw_connection = connection.raw_connection()
+        try:
+            cursor = raw_connection.cursor()
+            cursor.execute(f"DROP TABLE {table_name};")
+            raw_connection.commit()
+            cursor.close()
+        finally:
+            raw_connection.close()  # Back to the pool
+        invalidate_metrics('mysql', table_name)
+        invalidate_results('mysql', table_name)
         print(f"Table '{table_name}' has been deleted.")
     else:
         print("Invalid selection.")
@@ -17,6 +25,8 @@ def delete_mongodb_dataset(connection):
     collection_name = select_table_or_collection('mongodb')
     if collection_name:
         db.drop_collection(collection_name)
+        invalidate_metrics('mongodb', collection_name)
+        invalidate_results('mongodb', collection_name)
         print(f"Collection '{collection_name}' has been deleted.")
     else:
         print("Invalid selection.")
@@ -23,7 +23,8 @@ def explore_mysql(connection):
         for column in columns:
             print(f"{column['name']} \t {column['type']}")
         
-        df = pd.read_sql_table(table_name, connection)
+        # Only the first rows are shown, so only they are read
+        df = pd.read_sql_query(f"SELECT * FROM `{table_name}` LIMIT 5", connection)
         print(f"\nContents of table '{table_name}':")
         print(df.head())
         table_info = gather_sql_metrics(connection, table_name)
@@ -42,7 +43,7 @@ def explore_mongodb(connection):
             for key, value in sample_doc.items():
                 print(f"{key} \t {type(value).__name__}")
         
-        df = pd.DataFrame(list(db[collection_name].find()))
+        df = pd.DataFrame(list(db[collection_name].find().limit(5)))
         print(f"\nContents of collection '{collection_name}':")
         print(df.head())
         collection_info = gather_mongo_metrics(connection, collection_name)
@@ -1,6 +1,9 @@
+import time
+import config
+from utils.connect import query_engine
 from utils.common import select_table_or_collection
-from .sql_helpers import get_random_sql, execute_and_print_sql, gather_sql_metrics
-from .mongo_helpers import get_random_mongo, execute_and_print_mongo, gather_mongo_metrics
+from .sql_helpers import get_random_sql, run_sql, gather_sql_metrics
+from .mongo_helpers import get_random_mongo, run_mongo, gather_mongo_metrics
 from pprintpp import pprint
 
 def generate_random_query(db_type, connections):
@@ -11,17 +14,51 @@ def generate_random_query(db_type, connections):
     else:
         print("Unsupported db_type. Use 'mysql' or 'mongodb'.")
 
+def ask_query_count():
+    """Number of queries to generate, GENERATE_QUERY_COUNT when left empty."""
+    answer = input(f"How many queries to generate? [{config.GENERATE_QUERY_COUNT}]: ").strip()
+    if answer.isdigit() and int(answer) > 0:
+        return int(answer)
+    return config.GENERATE_QUERY_COUNT
+
+def timed(run, *args):
+    start = time.perf_counter()
+    output = run(*args)
+    return output, time.perf_counter() - start
+
+def run_generated(generated, run, workers=None):
+    """Run the generated queries on the shared async engine, at most `workers` at a time, and print each result,
+    with its wall time, in the order the queries were generated. `generated` is [(query, description, args of run)]."""
+    workers = max(1, min(workers or config.GENERATE_WORKERS, len(generated)))
+    start = time.perf_counter()
+    busy = 0
+    engine = query_engine()
+    # run_sql/run_mongo stream only the printed rows, so they run as blocking calls in the engine's slots
+    futures = engine.submit_all([engine.call(timed, run, *args) for _, _, args in generated], workers)
+    # Printed as soon as every earlier query is done, so later results never overtake earlier ones
+    for number, ((query, description, _), future) in enumerate(zip(generated, futures), start=1):
+        output, seconds = future.result()
+        busy += seconds
+        print(f"[{number}] Query: {query}\nDescription: {description}")
+        print(output)
+        print(f"({seconds * 1000:.1f} ms)\n")
+    elapsed = time.perf_counter() - start
+    print(f"Ran {len(generated)} queries with {workers} worker(s) in {elapsed:.2f}s "
+          f"({busy:.2f}s of query time, {busy / elapsed if elapsed > 0 else 0:.1f}x overlap).")
+
 def generate_mysql(connection):
     table_name = select_table_or_collection('mysql')
     
     if table_name:
         table_info = gather_sql_metrics(connection, table_name)
         # pprint(table_info)
+        count = ask_query_count()
         print("Randomly Generated Queries:")
-        for _ in range(5): 
+        generated = []
+        for _ in range(count):
             query, description = get_random_sql(table_name, table_info)
-            print(f"Query: {query}\nDescription: {description}\n")
-            execute_and_print_sql(connection, query)
+            generated.append((query, description, (connection, query)))
+        run_generated(generated, run_sql)
     else:
         print("Invalid table selection.")
 
@@ -30,10 +67,12 @@ def generate_mongodb(connection):
     if collection_name:
         collection_info = gather_mongo_metrics(connection, collection_name)
         # pprint(collection_info)
+        count = ask_query_count()
         print("Randomly Generated Queries:")
-        for _ in range(5): 
+        generated = []
+        for _ in range(count):
             query, description, query_obj = get_random_mongo(collection_name, collection_info)
-            print(f"Query: {query}\nDescription: {description}")
-            execute_and_print_mongo(connection, query_obj, collection_name)
+            generated.append((query, description, (connection, query_obj, collection_name)))
+        run_generated(generated, run_mongo)
     else:
         print("Invalid collection selection.")
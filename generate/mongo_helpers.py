@@ -2,7 +2,9 @@ import inspect
 import random
 import config
 from .mongo_templates import query_templates
-from pprintpp import pprint
+from profiler import profile_mongo
+from utils.mongo_window import aggregate_window, find_window
+from pprintpp import pformat
 
 
 # Helper function to select column based on type group (handles '/' options)
@@ -126,62 +128,15 @@ def get_random_mongo(collection_name, collection_info):
 
 
 def gather_mongo_metrics(connection, collection_name):
-    db_name = config.MYSQL_CONFIG['database']
-    db = connection[db_name]
-    collection = db[collection_name]
-    
-    total_rows = collection.count_documents({})
-    
-    # Initialize the structure to store field information
-    collection_info = {
-        'numeric': {},
-        'categorical': {},
-        'date': {},
-        'others': []
-    }
-    numeric_types = [int, float]
-    prop_map = {}
-
-    # Get all documents to infer schema
-    documents = list(collection.find())
-    # pprint(documents)
-    # Analyze fields and determine types
-    doc = documents[0] if documents else {}
-    for column, value in doc.items():
-        unique_values = collection.distinct(column)
-        unique_values_count = len(unique_values)
-        unique_value_proportion = unique_values_count / total_rows if total_rows > 0 else 0
-        
-        prop_map[column] = unique_value_proportion
-
-        # Skip certain fields or handle them as 'others'
-        if ("id" in column.lower() or unique_values_count == 1):
-            collection_info['others'].append(column)
-            continue
-
-        # Numeric columns
-        if (type(value) in numeric_types and ("price" in column.lower() or "qty" in column.lower() or "quantity" in column.lower() or unique_value_proportion >= config.NUMERIC_UNIQUE)) or (isinstance(value, str) and len(value) >= 1 and value[0].isdigit() and "-" not in value and unique_value_proportion >= config.NUMERIC_UNIQUE):
-            min_value = collection.find_one({column: { "$type": ["int", "long", "double", "decimal"], "$not": { "$eq": float('NaN') }}}, {column: 1, "_id": 0}, sort=[(column, 1)])[column]
-            max_value = collection.find_one({column: { "$type": ["int", "long", "double", "decimal"], "$not": { "$eq": float('NaN') } }}, {column: 1, "_id": 0}, sort=[(column, -1)])[column]
-            collection_info['numeric'][column] = {'min': min_value, 'max': max_value}
-
-        # Date columns
-        elif "date" in column.lower() or "time" in column.lower() or "year" in column.lower() or "month" in column.lower() or "day" in column.lower(): 
-            earliest = collection.find_one({column: {"$type": "string"}}, {column: 1, "_id": 0}, sort=[(column, 1)])[column]
-            latest = collection.find_one({column: {"$type": "string"}}, {column: 1, "_id": 0}, sort=[(column, -1)])[column]
-            collection_info['date'][column] = {'earliest': earliest, 'latest': latest}
-
-        # High proportion of unique values: classify as 'others'
-        elif unique_value_proportion >= config.OTHERS_UNQIUE:
-            collection_info['others'].append(column)
-
-        # Categorical columns
-        else:
-            collection_info['categorical'][column] = {'unique_values': unique_values}
-
-    return collection_info
+    """collection_info of a MongoDB collection, from the shared profiler."""
+    db = connection[config.MYSQL_CONFIG['database']]
+    return profile_mongo(db, collection_name)['table_info']
 
 def execute_and_print_mongo(connection, query_object, collection_name):
+    print(run_mongo(connection, query_object, collection_name))
+
+def run_mongo(connection, query_object, collection_name):
+    """Printable result of a generated query: its documents (the first ones of a long result) and the total."""
     try:
         # Extract database and method
         db_name = config.MYSQL_CONFIG['database']
@@ -190,30 +145,25 @@ def execute_and_print_mongo(connection, query_object, collection_name):
         
         method = query_object["method"]
         
-        # Execute the query based on the method
+        # Execute the query based on the method, fetching only the documents that are printed
         if method == "find":
-            cursor = collection.find(query_object["query"], query_object.get("projection", {}))
-            # Apply modifiers
-            if "modifiers" in query_object:
-                for mod, args in query_object["modifiers"].items():
-                    cursor = getattr(cursor, mod)(args)
-            result = list(cursor)
+            result, total = find_window(collection, query_object["query"], query_object.get("projection", {}),
+                                        query_object.get("modifiers"))
         elif method == "aggregate":
-            result = list(collection.aggregate(query_object["pipeline"]))
+            result, total = aggregate_window(collection, query_object["pipeline"])
         elif method == "distinct":
+            # A single reply document already, capped by the server
             result = collection.distinct(query_object["query"])
+            total = len(result)
         else:
             raise ValueError(f"Unsupported query method: {method}")
 
-        # Print the results
-        if len(result) > 15:
-            print("Showing the first 7 rows:")
-            pprint(result[:7])  # Print the first 10 rows
-            print(f"Total number of rows: {len(result)}")
-        else:
-            pprint(result)  # Print all rows
-            print(f"Total number of rows: {len(result)}")
-
+        # Format the results
+        if total > config.MONGO_PRINT_MAX_DOCS:
+            return (f"Showing the first {config.MONGO_PRINT_HEAD_DOCS} rows:\n"
+                    f"{pformat(result[:config.MONGO_PRINT_HEAD_DOCS])}\n"
+                    f"Total number of rows: {total}")
+        return f"{pformat(result)}\nTotal number of rows: {total}"  # All rows
 
     except Exception as e:
-        print(f"Error executing query: {e}")
\ No newline at end of file
+        return f"Error executing query: {e}"
\ No newline at end of file
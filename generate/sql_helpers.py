@@ -1,8 +1,11 @@
 import inspect
 import config
 import random
+from profiler import profile_mysql
 from .sql_templates import query_templates
 from prettytable import PrettyTable
+from pymysql.cursors import SSCursor
+from utils.row_window import RowWindow, stream_rows
 
 # Helper function to select column based on type group (handles '/' options)
 def select_column_type_group(col_type_group, table_info):
@@ -131,136 +134,61 @@ def get_random_sql(table_name, table_info):
 
     
 def gather_sql_metrics(connection, table_name):
+    """table_info of a MySQL table, from the shared profiler."""
     raw_connection = connection.raw_connection()
-    cursor = raw_connection.cursor()
-    
-    # Step 1: Fetch column names, data types, and total rows in the table
-    cursor.execute(f"SELECT COLUMN_NAME, DATA_TYPE FROM information_schema.columns WHERE table_name = '{table_name}';")
-    schema = cursor.fetchall()
-    cursor.execute(f"SELECT COUNT(*) FROM {table_name};")
-    total_rows = cursor.fetchone()[0]
-    
-    # Structure to store column information
-    table_info = {
-        'numeric': {},
-        'categorical': {},
-        'date': {},
-        'others': [] 
-    }
-    numeric_types = ['int', 'bigint', 'float', 'double', 'decimal']
-    prop_map = {}
-
-    # Step 2: Collect additional information for each column based on its type
-    for column, data_type in schema:
-        cursor.execute(f"SELECT COUNT(DISTINCT `{column}`) FROM {table_name};")
-        
-        unique_values_count = cursor.fetchone()[0]
-        
-        unique_value_proportion = unique_values_count / total_rows if total_rows > 0 else 0
-        # if "battery" in column.lower():
-        #     print(column, unique_values_count, total_rows, unique_value_proportion)
-
-        prop_map[column] = unique_value_proportion
-
-        if ("id" in column.lower()  or
-            unique_values_count == 1):
-            table_info['others'].append(column)
-            continue
-
-        if data_type in numeric_types and ("price" in column.lower() or "qty" in column.lower() or "quantity" in column.lower() or unique_value_proportion >= config.NUMERIC_UNIQUE):
-            cursor.execute(f"SELECT MIN(`{column}`), MAX(`{column}`) FROM {table_name};")
-            min_value, max_value = cursor.fetchone()
-            table_info['numeric'][column] = {'min': min_value, 'max': max_value}
-        elif 'date' in data_type or 'time' in data_type:
-            cursor.execute(f"SELECT MIN(`{column}`), MAX(`{column}`) FROM {table_name};")
-            earliest, latest = cursor.fetchone()
-            table_info['date'][column] = {'earliest': earliest, 'latest': latest}
-        elif unique_value_proportion >= config.OTHERS_UNQIUE:
-            table_info['others'].append(column)
-        else:
-            cursor.execute(f"SELECT DISTINCT `{column}` FROM {table_name};")
-            unique_values = [row[0] for row in cursor.fetchall()]
-            table_info['categorical'][column] = {'unique_values': unique_values}
-        
-
-    cursor.close()
-    return table_info
-
-# def execute_and_print_sql(connection, query):
     try:
-        raw_connection = connection.raw_connection()
-        cursor = raw_connection.cursor()
-
-        cursor.execute(query)
+        return profile_mysql(raw_connection, table_name, connection.raw_connection)['table_info']
+    finally:
+        raw_connection.close()
 
-        columns = [desc[0] for desc in cursor.description] if cursor.description else []
-        rows = cursor.fetchall()
-
-        table = PrettyTable()
-        table.field_names = columns  # Set column headers
-        table.align = "l"  # Left-align the content
-
-        if len(rows) > 30:
-            for row in rows[:10]:
-                table.add_row(row)
-            table.add_row(["..."])
-            for row in rows[-5:]:
-                table.add_row(row)
-        else:
-            for row in rows:
-                table.add_row(row)
-
-        print(table)
-
-        print(f"\n{len(rows)} row(s) in set")
+def execute_and_print_sql(connection, query):
+    print(run_sql(connection, query))
 
-    except Exception as err:
-        print(f"Error: {err}")
 
-def execute_and_print_sql(connection, query):
+def run_sql(connection, query):
+    """Printable result of a generated query: a table of its rows (first and last ones if long) and the row count."""
+    raw_connection = connection.raw_connection()
+    # Server-side cursor: rows are streamed from the server instead of the whole result being buffered first
+    cursor = raw_connection.cursor(SSCursor)
     try:
-        raw_connection = connection.raw_connection()
-        cursor = raw_connection.cursor()
-
         # Execute the query
         cursor.execute(query)
 
-        # Fetch columns and rows
+        # Fetch columns and stream the rows, keeping only those that are printed
         columns = [desc[0] for desc in cursor.description] if cursor.description else []
-        rows = cursor.fetchall()
-
-        # Adjust rows to match column count
-        adjusted_rows = []
-        for row in rows:
-            if len(row) < len(columns):
-                # Add None for missing values
-                adjusted_row = list(row) + [None] * (len(columns) - len(row))
-            elif len(row) > len(columns):
-                # Truncate extra values
-                adjusted_row = row[:len(columns)]
-            else:
-                adjusted_row = row
-            adjusted_rows.append(adjusted_row)
+        window = RowWindow()
+        for rows in stream_rows(cursor):
+            window.extend(rows)
 
         # Initialize PrettyTable
         table = PrettyTable()
         table.field_names = columns  # Set column headers
         table.align = "l"  # Left-align the content
 
-        # Handle large result sets
-        if len(adjusted_rows) > 30:
-            for row in adjusted_rows[:10]:
-                table.add_row(row)
+        # Large result sets show their first and last rows
+        first_rows, last_rows = window.shown()
+        for row in first_rows:
+            table.add_row(adjust_row(row, columns))
+        if window.truncated:
             table.add_row(["..."] * len(columns))  # Add "..." for skipped rows
-            for row in adjusted_rows[-5:]:
-                table.add_row(row)
-        else:
-            for row in adjusted_rows:
-                table.add_row(row)
+            for row in last_rows:
+                table.add_row(adjust_row(row, columns))
 
-        # Print the table
-        print(table)
-        print(f"\n{len(adjusted_rows)} row(s) in set")
+        return f"{table}\n\n{window.count} row(s) in set"
 
     except Exception as err:
-        print(f"Error: {err}")
+        return f"Error: {err}"
+    finally:
+        cursor.close()
+        raw_connection.close()
+
+
+def adjust_row(row, columns):
+    """Pad a row with None or truncate it to match the column count."""
+    if len(row) < len(columns):
+        # Add None for missing values
+        return list(row) + [None] * (len(columns) - len(row))
+    if len(row) > len(columns):
+        # Truncate extra values
+        return row[:len(columns)]
+    return row
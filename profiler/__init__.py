@@ -0,0 +1,2 @@
+from .mysql_profiler import profile_mysql
+from .mongo_profiler import profile_mongo
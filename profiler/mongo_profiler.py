@@ -0,0 +1,116 @@
+import config
+from utils.sketch import approx_distinct_mongo
+from utils.sampling import mongo_sample_pipeline, mongo_indexed_fields, mongo_indexed_extremes, MONGO_NUMBER_FILTER, MONGO_STRING_FILTER
+from utils.metrics_cache import mongo_collection_version, load_metrics, save_metrics
+from .rules import new_profile, map_field, classify_column, add_categorical
+
+NUMERIC_TYPES = [int, float]
+
+
+def is_date_field(field):
+    name = field.lower()
+    return "date" in name or "time" in name or "year" in name or "month" in name or "day" in name
+
+
+def profile_mongo_fields(collection, fields, pipeline=None):
+    """Profile every field in one $facet aggregation: cardinality, numeric/string min and max, and type histogram.
+
+    `pipeline` optionally restricts the profile to a subset of documents, e.g. the sample of mongo_sample_pipeline.
+    """
+    pipeline = list(pipeline or [])
+    approximate = config.DISTINCT_MODE == 'approx'
+    stats = {"_id": None, "total": {"$sum": 1}}
+    facets = {}
+    for index, field in enumerate(fields):
+        path = f"${field}"
+        is_number = {"$and": [{"$isNumber": path}, {"$ne": [path, float('NaN')]}]}
+        is_string = {"$eq": [{"$type": path}, "string"]}
+        stats[f"num_min_{index}"] = {"$min": {"$cond": [is_number, path, None]}}
+        stats[f"num_max_{index}"] = {"$max": {"$cond": [is_number, path, None]}}
+        stats[f"str_min_{index}"] = {"$min": {"$cond": [is_string, path, None]}}
+        stats[f"str_max_{index}"] = {"$max": {"$cond": [is_string, path, None]}}
+        # Facet names are index based since field names may contain '.' or '$'
+        if not approximate:
+            facets[f"distinct_{index}"] = [
+                {"$match": {field: {"$exists": True}}},
+                {"$group": {"_id": path}},
+                {"$count": "count"}
+            ]
+        facets[f"types_{index}"] = [{"$group": {"_id": {"$type": path}, "count": {"$sum": 1}}}]
+    facets["stats"] = [{"$group": stats}]
+
+    result = next(collection.aggregate(pipeline + [{"$facet": facets}], allowDiskUse=True), {})
+    stats_row = result["stats"][0] if result.get("stats") else {}
+    # Approximate mode replaces the per-field $group facets with one HyperLogLog pass
+    approx_counts = approx_distinct_mongo(collection, fields, pipeline) if approximate else {}
+
+    profile = {}
+    for index, field in enumerate(fields):
+        distinct_rows = result.get(f"distinct_{index}", [])
+        profile[field] = {
+            'distinct': approx_counts[field] if approximate else (distinct_rows[0]["count"] if distinct_rows else 0),
+            'numeric_min': stats_row.get(f"num_min_{index}"),
+            'numeric_max': stats_row.get(f"num_max_{index}"),
+            'string_min': stats_row.get(f"str_min_{index}"),
+            'string_max': stats_row.get(f"str_max_{index}"),
+            'types': {row["_id"]: row["count"] for row in result.get(f"types_{index}", [])}
+        }
+    return stats_row.get("total", 0), profile
+
+
+def fetch_mongo_unique_values(collection, fields, pipeline=None):
+    """Collect the distinct values of several fields with a single $group."""
+    if not fields:
+        return {}
+    group = {"_id": None}
+    for index, field in enumerate(fields):
+        group[f"values_{index}"] = {"$addToSet": f"${field}"}
+    result = next(collection.aggregate(list(pipeline or []) + [{"$group": group}], allowDiskUse=True), {})
+    return {field: result.get(f"values_{index}", []) for index, field in enumerate(fields)}
+
+
+def profile_mongo(db, collection_name):
+    """Profile a MongoDB collection once per version: table_info plus field mapping and store location entries."""
+    collection = db[collection_name]
+
+    # Reuse the profile computed earlier in this session or a previous one while the collection is unchanged
+    version = mongo_collection_version(collection)
+    cached = load_metrics('mongodb', collection_name, version)
+    if cached:
+        return cached
+
+    # Infer the schema from the first document and profile all fields at once (over a sample in 'sample' mode)
+    doc = collection.find_one() or {}
+    pipeline = mongo_sample_pipeline(collection)
+    total_rows, fields = profile_mongo_fields(collection, list(doc.keys()), pipeline)
+    indexed_fields = mongo_indexed_fields(collection) if pipeline else set()
+
+    profile = new_profile()
+    table_info = profile['table_info']
+    table_info['field_types'] = {}
+    categorical_fields = []
+    for column, value in doc.items():
+        table_info['field_types'][column] = fields[column]['types']
+        is_numeric = type(value) in NUMERIC_TYPES
+        map_field(profile['field_mapping'], column, is_numeric)
+        kind = classify_column(column, fields[column]['distinct'], total_rows, is_numeric, is_date_field(column))
+
+        if kind == 'numeric':
+            if column in indexed_fields:
+                # Exact extremes come cheaply from the ends of the index
+                fields[column]['numeric_min'], fields[column]['numeric_max'] = mongo_indexed_extremes(collection, column, MONGO_NUMBER_FILTER)
+            table_info['numeric'][column] = {'min': fields[column]['numeric_min'], 'max': fields[column]['numeric_max']}
+        elif kind == 'date':
+            if column in indexed_fields:
+                fields[column]['string_min'], fields[column]['string_max'] = mongo_indexed_extremes(collection, column, MONGO_STRING_FILTER)
+            table_info['date'][column] = {'earliest': fields[column]['string_min'], 'latest': fields[column]['string_max']}
+        elif kind == 'others':
+            table_info['others'].append(column)
+        else:
+            categorical_fields.append(column)
+
+    for column, unique_values in fetch_mongo_unique_values(collection, categorical_fields, pipeline).items():
+        add_categorical(profile, column, unique_values)
+
+    save_metrics('mongodb', collection_name, version, profile)
+    return profile
@@ -0,0 +1,111 @@
+from functools import partial
+import config
+from utils.sketch import approx_distinct_mysql
+from utils.sampling import create_mysql_sample, drop_mysql_sample, mysql_indexed_min_max
+from utils.metrics_cache import mysql_table_version, load_metrics, save_metrics
+from utils.probes import run_column_probes
+from .rules import new_profile, map_field, classify_column, add_categorical
+
+NUMERIC_TYPES = ['int', 'bigint', 'float', 'double', 'decimal']
+
+
+def is_date_type(data_type):
+    return 'date' in data_type or 'time' in data_type
+
+
+def profile_sql_columns(cursor, source, schema, connect=None):
+    """Compute the row count, distinct counts and min/max of every column of `source` (a table or its sample) in a single aggregate statement.
+
+    `connect` opens extra connections so the per-column approximate counts can run in parallel.
+    """
+    approximate = config.DISTINCT_MODE == 'approx'
+    select_list = ["COUNT(*)"]
+    for column, data_type in schema:
+        if not approximate:
+            select_list.append(f"COUNT(DISTINCT `{column}`)")
+        # MIN/MAX are only needed for columns that can end up numeric or date
+        if data_type in NUMERIC_TYPES or is_date_type(data_type):
+            select_list.append(f"MIN(`{column}`)")
+            select_list.append(f"MAX(`{column}`)")
+    cursor.execute(f"SELECT {', '.join(select_list)} FROM {source};")
+    row = list(cursor.fetchone())
+
+    total_rows = row.pop(0)
+    # Approximate mode sketches each column server-side instead of an exact COUNT(DISTINCT)
+    if approximate:
+        approx_counts = run_column_probes(cursor, connect, [partial(approx_distinct_mysql, source=source, column=column) for column, _ in schema])
+    profile = {}
+    for index, (column, data_type) in enumerate(schema):
+        column_profile = {'distinct': approx_counts[index] if approximate else row.pop(0)}
+        if data_type in NUMERIC_TYPES or is_date_type(data_type):
+            column_profile['min'] = row.pop(0)
+            column_profile['max'] = row.pop(0)
+        profile[column] = column_profile
+    return total_rows, profile
+
+
+def fetch_distinct_values(cursor, source, column):
+    cursor.execute(f"SELECT DISTINCT `{column}` FROM {source};")
+    return [row[0] for row in cursor.fetchall()]
+
+
+def profile_mysql(connection, table_name, connect=None):
+    """Profile a MySQL table once per version: table_info plus field mapping and store location entries.
+
+    `connection` is a DB-API connection; `connect` optionally opens more of them for parallel column probes.
+    """
+    cursor = connection.cursor()
+    try:
+        # Reuse the profile computed earlier in this session or a previous one while the table is unchanged
+        version = mysql_table_version(cursor, table_name)
+        cached = load_metrics('mysql', table_name, version)
+        if cached:
+            return cached
+
+        # Step 1: Fetch column names and data types
+        cursor.execute(
+            "SELECT COLUMN_NAME, DATA_TYPE FROM information_schema.columns "
+            "WHERE table_schema = DATABASE() AND table_name = %s ORDER BY ORDINAL_POSITION;",
+            (table_name,))
+        schema = cursor.fetchall()
+
+        # Step 2: Profile every column in one pass over the table (or a random sample of it)
+        source = create_mysql_sample(cursor, table_name)
+        try:
+            # A sample lives in a session-private temporary table, so only full-table probes can use other connections
+            column_connect = connect if source == table_name else None
+            total_rows, columns = profile_sql_columns(cursor, source, schema, column_connect)
+            if source != table_name:
+                # Extremes of indexed columns are cheap to get exactly from the full table
+                for column, (min_value, max_value) in mysql_indexed_min_max(cursor, table_name, columns).items():
+                    if 'min' in columns[column]:
+                        columns[column]['min'], columns[column]['max'] = min_value, max_value
+
+            # Step 3: Classify each column from its profile
+            profile = new_profile()
+            table_info = profile['table_info']
+            categorical_columns = []
+            for column, data_type in schema:
+                map_field(profile['field_mapping'], column, data_type in NUMERIC_TYPES)
+                kind = classify_column(column, columns[column]['distinct'], total_rows,
+                                       data_type in NUMERIC_TYPES, is_date_type(data_type))
+                if kind == 'numeric':
+                    table_info['numeric'][column] = {'min': columns[column]['min'], 'max': columns[column]['max']}
+                elif kind == 'date':
+                    table_info['date'][column] = {'earliest': columns[column]['min'], 'latest': columns[column]['max']}
+                elif kind == 'others':
+                    table_info['others'].append(column)
+                else:
+                    categorical_columns.append(column)
+
+            # Step 4: Categorical values still need one query per column, optionally spread over a connection pool
+            probes = [partial(fetch_distinct_values, source=source, column=column) for column in categorical_columns]
+            for column, unique_values in zip(categorical_columns, run_column_probes(cursor, column_connect, probes)):
+                add_categorical(profile, column, unique_values)
+        finally:
+            drop_mysql_sample(cursor, source, table_name)
+
+        save_metrics('mysql', table_name, version, profile)
+        return profile
+    finally:
+        cursor.close()
@@ -0,0 +1,59 @@
+import re
+import config
+
+# Columns holding store locations; their values feed the known store locations of the NL parsers
+LOCATION_PATTERN = re.compile(r"(location|branch|area|city)", re.IGNORECASE)
+
+
+def new_profile():
+    """Empty profile shared by every path: the table_info used by explore/generate/ask plus the ask mappings."""
+    return {
+        'table_info': {
+            'numeric': {},
+            'categorical': {},
+            'date': {},
+            'others': []
+        },
+        'field_mapping': {},
+        'known_store_locations': {}
+    }
+
+
+def map_field(field_mapping, column, is_numeric):
+    """Record the column and the well-known roles (quantity, price, product, name) it may play."""
+    name = column.lower()
+    field_mapping[name] = column
+    if re.search(r'(qty|quantity|count)', name):
+        field_mapping['quantity'] = column
+    elif re.search(r'(price_usd|price|cost|amount)', name) and is_numeric:
+        field_mapping['price'] = column
+    elif re.search(r'(product|model)', name):
+        field_mapping['product'] = column
+    elif re.search(r'(name|artist)', name):
+        field_mapping['name'] = column
+
+
+def classify_column(column, unique_values_count, total_rows, is_numeric, is_date):
+    """Classify a column as 'numeric', 'date', 'categorical' or 'others'."""
+    name = column.lower()
+    unique_value_proportion = unique_values_count / total_rows if total_rows > 0 else 0
+
+    # Location columns are always categorical so their values can be matched in questions
+    if LOCATION_PATTERN.search(name) and "id" not in name:
+        return 'categorical'
+    if "id" in name or unique_values_count == 1:
+        return 'others'
+    if is_numeric and ("price" in name or "qty" in name or "quantity" in name or unique_value_proportion >= config.NUMERIC_UNIQUE):
+        return 'numeric'
+    if is_date:
+        return 'date'
+    if unique_value_proportion >= config.OTHERS_UNQIUE:
+        return 'others'
+    return 'categorical'
+
+
+def add_categorical(profile, column, unique_values):
+    profile['table_info']['categorical'][column] = {'unique_values': unique_values}
+    if LOCATION_PATTERN.search(column.lower()):
+        profile['known_store_locations'].update({str(value).lower(): str(value) for value in unique_values if isinstance(value, str)})
+        profile['field_mapping']['store_location'] = column
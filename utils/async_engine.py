@@ -0,0 +1,213 @@
+"""Asynchronous query execution for MySQL and MongoDB: one long-lived event loop keeps many queries in flight.
+
+The process has one engine, owned by CONNECTOR (utils.connect.query_engine()). Its event loop runs on a
+background thread and its pools live as long as the process, like the synchronous ones. MongoDB goes through
+PyMongo's native AsyncMongoClient and MySQL through an aiomysql pool (see requirements.txt). Without aiomysql,
+MySQL queries fall back to the shared pooled PyMySQL connections on the loop's worker threads, behind the same
+coroutine API. Synchronous callers use run_query()/run_queries(), or submit_all() for blocking calls such as
+the generate printers.
+"""
+import asyncio
+import atexit
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pymongo import AsyncMongoClient
+import config
+from utils.connect import MongoPoolListener, mysql_connection, query_engine
+
+try:
+    import aiomysql
+except ImportError:
+    aiomysql = None
+
+
+def mongo_query_object(query):
+    """Generated query object ({"method": ...}) of a MongoDB query: NL pipelines (list) and find filters (dict) too."""
+    if isinstance(query, list):
+        return {"method": "aggregate", "pipeline": query}
+    if "method" in query:
+        return query
+    return {"method": "find", "query": query}
+
+
+def fetch_sql(query):
+    """Rows of `query` on a pooled connection (the blocking fallback when aiomysql is not installed)."""
+    connection = mysql_connection()
+    try:
+        cursor = connection.cursor()
+        try:
+            cursor.execute(query)
+            return cursor.fetchall()
+        finally:
+            cursor.close()
+    finally:
+        connection.close()
+
+
+class AsyncQueryEngine:
+    """Runs SQL and MongoDB queries concurrently on its own event loop, at most `max_in_flight` at a time.
+
+    The loop thread and the pools are started on first use and closed when the process exits.
+    """
+
+    def __init__(self, max_in_flight=None):
+        self.max_in_flight = max_in_flight or config.ASYNC_MAX_IN_FLIGHT
+        self.lock = threading.Lock()
+        self.loop = None
+        self.thread = None
+        self.mysql_pool = None
+        self.mongo_client = None
+        self.mongo_listener = MongoPoolListener()
+        # Only changed on the loop thread
+        self.in_flight = 0
+        self.completed = 0
+
+    def start(self):
+        """The engine's event loop, started on a daemon thread the first time."""
+        with self.lock:
+            if self.loop is None:
+                loop = asyncio.new_event_loop()
+                # One worker thread per slot, so blocking MySQL calls never wait for a thread
+                loop.set_default_executor(ThreadPoolExecutor(max_workers=self.max_in_flight,
+                                                             thread_name_prefix="async-engine"))
+                self.slots = asyncio.Semaphore(self.max_in_flight)
+                self.pool_lock = asyncio.Lock()
+                self.thread = threading.Thread(target=loop.run_forever, name="async-engine-loop", daemon=True)
+                self.thread.start()
+                self.loop = loop
+                atexit.register(self.close)
+        return self.loop
+
+    async def mysql(self):
+        """The engine's aiomysql pool, opened on first use."""
+        async with self.pool_lock:
+            if self.mysql_pool is None:
+                self.mysql_pool = await aiomysql.create_pool(
+                    host=config.MYSQL_CONFIG['host'], user=config.MYSQL_CONFIG['user'],
+                    password=config.MYSQL_CONFIG['password'], db=config.MYSQL_CONFIG['database'],
+                    maxsize=config.MYSQL_POOL_SIZE, pool_recycle=config.MYSQL_POOL_RECYCLE, autocommit=True)
+        return self.mysql_pool
+
+    def mongo_db(self):
+        # Called on the loop thread only, so the client is created once without a lock
+        if self.mongo_client is None:
+            self.mongo_client = AsyncMongoClient(
+                config.MONGODB_URI, maxPoolSize=config.MONGO_POOL_SIZE,
+                maxIdleTimeMS=config.MONGO_POOL_MAX_IDLE_MS, event_listeners=[self.mongo_listener])
+        return self.mongo_client[config.MYSQL_CONFIG['database']]
+
+    async def slot(self, coroutine):
+        """Await `coroutine` in one of the engine's in-flight slots."""
+        async with self.slots:
+            self.in_flight += 1
+            try:
+                return await coroutine
+            finally:
+                self.in_flight -= 1
+                self.completed += 1
+
+    async def call(self, func, *args):
+        """Result of a blocking call, run on a worker thread."""
+        return await self.slot(asyncio.to_thread(func, *args))
+
+    async def fetch_rows(self, query):
+        pool = await self.mysql()
+        async with pool.acquire() as connection:
+            async with connection.cursor() as cursor:
+                await cursor.execute(query)
+                return await cursor.fetchall()
+
+    async def sql(self, query):
+        """Rows of a SQL query."""
+        if aiomysql is None:
+            return await self.call(fetch_sql, query)
+        return await self.slot(self.fetch_rows(query))
+
+    async def find_documents(self, collection_name, query_object):
+        collection = self.mongo_db()[collection_name]
+        method = query_object["method"]
+        if method == "find":
+            cursor = collection.find(query_object["query"], query_object.get("projection"))
+            for mod, args in query_object.get("modifiers", {}).items():
+                cursor = getattr(cursor, mod)(args)
+            return await cursor.to_list(None)
+        if method == "aggregate":
+            cursor = await collection.aggregate(query_object["pipeline"])
+            return await cursor.to_list(None)
+        if method == "distinct":
+            return await collection.distinct(query_object["query"])
+        raise ValueError(f"Unsupported query method: {method}")
+
+    async def mongo(self, collection_name, query):
+        """Documents of a MongoDB query on `collection_name`: a pipeline, a find filter or a generated query object."""
+        return await self.slot(self.find_documents(collection_name, mongo_query_object(query)))
+
+    async def execute(self, db_type, name, query):
+        """Result of `query` on table/collection `name`."""
+        if db_type == 'mysql':
+            return await self.sql(query)
+        return await self.mongo(name, query)
+
+    def submit_all(self, coroutines, max_in_flight=None):
+        """Schedule coroutines on the engine loop and return their concurrent.futures.Future, in order.
+
+        At most `max_in_flight` of them run at once, on top of the engine-wide limit shared by every caller.
+        """
+        loop = self.start()
+        batch_slots = asyncio.Semaphore(max_in_flight or self.max_in_flight)
+
+        async def bounded(coroutine):
+            async with batch_slots:
+                return await coroutine
+        return [asyncio.run_coroutine_threadsafe(bounded(coroutine), loop) for coroutine in coroutines]
+
+    def stats(self):
+        return {'max_in_flight': self.max_in_flight, 'in_flight': self.in_flight, 'completed': self.completed,
+                'mysql_driver': 'aiomysql' if aiomysql is not None else 'threads'}
+
+    def mysql_pool_stats(self):
+        pool = self.mysql_pool
+        return {'size': pool.maxsize, 'in_use': pool.size - pool.freesize, 'idle': pool.freesize, 'open': pool.size}
+
+    async def close_clients(self):
+        if self.mysql_pool is not None:
+            self.mysql_pool.close()
+            await self.mysql_pool.wait_closed()
+            self.mysql_pool = None
+        if self.mongo_client is not None:
+            await self.mongo_client.close()
+            self.mongo_client = None
+
+    def close(self):
+        """Close the MySQL pool and MongoDB client and stop the loop thread."""
+        with self.lock:
+            loop, self.loop = self.loop, None
+        if loop is None:
+            return
+        asyncio.run_coroutine_threadsafe(self.close_clients(), loop).result()
+        loop.call_soon_threadsafe(loop.stop)
+        self.thread.join()
+        loop.close()
+
+
+def run_queries(submissions, max_in_flight=None):
+    """Run [(db_type, name, query)] on the shared engine and return their results in submission order.
+
+    The synchronous entry point; a query that fails gives its exception instead of a result.
+    """
+    engine = query_engine()
+    futures = engine.submit_all((engine.execute(db_type, name, query) for db_type, name, query in submissions),
+                                max_in_flight)
+    results = []
+    for future in futures:
+        try:
+            results.append(future.result())
+        except Exception as e:
+            results.append(e)
+    return results
+
+
+def run_query(db_type, name, query):
+    """Result of one query on the shared engine; raises what the query raised."""
+    engine = query_engine()
+    return engine.submit_all([engine.execute(db_type, name, query)])[0].result()
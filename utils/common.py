@@ -1,6 +1,6 @@
-from sqlalchemy import create_engine, inspect
-import pymongo
+from sqlalchemy import inspect
 import config
+from utils.connect import mongo_db, mysql_engine
 
 def get_db_type():
     print("\nSelect Database System:")
@@ -24,15 +24,11 @@ def get_tables_or_collections(db_type):
         return []
 
 def get_mysql_tables():
-    connection_string = f"mysql+pymysql://{config.MYSQL_CONFIG['user']}:{config.MYSQL_CONFIG['password']}@{config.MYSQL_CONFIG['host']}/{config.MYSQL_CONFIG['database']}"
-    engine = create_engine(connection_string)
-    inspector = inspect(engine)
+    inspector = inspect(mysql_engine())
     return inspector.get_table_names()
 
 def get_mongodb_collections():
-    client = pymongo.MongoClient(config.MONGODB_URI)
-    db = client[config.MYSQL_CONFIG['database']]
-    return db.list_collection_names()
+    return mongo_db().list_collection_names()
 
 def select_table_or_collection(db_type):
     tables_or_collections = get_tables_or_collections(db_type)
@@ -1,23 +1,157 @@
-from sqlalchemy import create_engine
+import threading
+from sqlalchemy import create_engine, event
 import pymongo
+from pymongo import monitoring
 import config
 
+
+class MongoPoolListener(monitoring.ConnectionPoolListener):
+    """Counts MongoDB connections opened and checked out, for pool_stats()."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counts = {'opened': 0, 'closed': 0, 'checkouts': 0, 'in_use': 0}
+
+    def bump(self, **changes):
+        with self.lock:
+            for key, change in changes.items():
+                self.counts[key] += change
+
+    def stats(self):
+        with self.lock:
+            counts = dict(self.counts)
+        return {'size': config.MONGO_POOL_SIZE, 'in_use': counts['in_use'],
+                'open': counts['opened'] - counts['closed'], 'opened': counts['opened'],
+                'checkouts': counts['checkouts']}
+
+    def connection_created(self, event):
+        self.bump(opened=1)
+
+    def connection_closed(self, event):
+        self.bump(closed=1)
+
+    def connection_checked_out(self, event):
+        self.bump(checkouts=1, in_use=1)
+
+    def connection_checked_in(self, event):
+        self.bump(in_use=-1)
+
+    # Events the stats do not need
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_check_out_started(self, event):
+        pass
+
+    def connection_check_out_failed(self, event):
+        pass
+
+
 class DatabaseConnector:
+    """The MySQL engine and MongoDB client of the process, each holding a connection pool; created on first use."""
+
     def __init__(self):
         self.connections = [None, None]
+        self.lock = threading.Lock()
+        # Connect events fire on whichever thread grows the pool
+        self.counter_lock = threading.Lock()
+        self.mysql_connects = 0
+        self.mongo_listener = MongoPoolListener()
+        self.async_engine = None
 
     def connect_mysql(self):
-        if self.connections[0] is None:
-            connection_string = f"mysql+pymysql://{config.MYSQL_CONFIG['user']}:{config.MYSQL_CONFIG['password']}@{config.MYSQL_CONFIG['host']}/{config.MYSQL_CONFIG['database']}"
-            self.connections[0] = create_engine(connection_string)
-        return
+        with self.lock:
+            if self.connections[0] is None:
+                connection_string = f"mysql+pymysql://{config.MYSQL_CONFIG['user']}:{config.MYSQL_CONFIG['password']}@{config.MYSQL_CONFIG['host']}/{config.MYSQL_CONFIG['database']}"
+                engine = create_engine(connection_string, connect_args={'local_infile': config.MYSQL_LOCAL_INFILE},
+                                       pool_size=config.MYSQL_POOL_SIZE, max_overflow=config.MYSQL_POOL_MAX_OVERFLOW,
+                                       pool_recycle=config.MYSQL_POOL_RECYCLE, pool_pre_ping=config.MYSQL_POOL_PRE_PING)
+                event.listen(engine, 'connect', self.count_mysql_connect)
+                self.connections[0] = engine
+        return self.connections[0]
+
+    def count_mysql_connect(self, dbapi_connection, connection_record):
+        with self.counter_lock:
+            self.mysql_connects += 1
 
     def connect_mongodb(self):
-        if self.connections[1] is None:
-            self.connections[1] = pymongo.MongoClient(config.MONGODB_URI)
-        return
-    
+        with self.lock:
+            if self.connections[1] is None:
+                self.connections[1] = pymongo.MongoClient(
+                    config.MONGODB_URI, maxPoolSize=config.MONGO_POOL_SIZE,
+                    maxIdleTimeMS=config.MONGO_POOL_MAX_IDLE_MS, event_listeners=[self.mongo_listener])
+        return self.connections[1]
+
+    def connect_async(self):
+        # Imported here: the engine module builds on the helpers below
+        from utils.async_engine import AsyncQueryEngine
+
+        with self.lock:
+            if self.async_engine is None:
+                self.async_engine = AsyncQueryEngine()
+        return self.async_engine
+
     def connect_all(self):
         self.connect_mysql()
         self.connect_mongodb()
-        return
\ No newline at end of file
+        return
+
+    def pool_stats(self):
+        """Utilization of the pools created so far: {'mysql': {...}, 'mongodb': {...}, 'async': {...}, 'async_mysql': {...}, 'async_mongodb': {...}}."""
+        stats = {}
+        engine = self.connections[0]
+        if engine is not None:
+            pool = engine.pool
+            with self.counter_lock:
+                opened = self.mysql_connects
+            stats['mysql'] = {'size': pool.size(), 'in_use': pool.checkedout(), 'idle': pool.checkedin(),
+                              'overflow': max(pool.overflow(), 0), 'opened': opened}
+        if self.connections[1] is not None:
+            stats['mongodb'] = self.mongo_listener.stats()
+        if self.async_engine is not None:
+            stats['async'] = self.async_engine.stats()
+            if self.async_engine.mysql_pool is not None:
+                stats['async_mysql'] = self.async_engine.mysql_pool_stats()
+            if self.async_engine.mongo_client is not None:
+                stats['async_mongodb'] = self.async_engine.mongo_listener.stats()
+        return stats
+
+    def pool_summary(self):
+        return "; ".join(f"{name}: " + ", ".join(f"{key} {value}" for key, value in stats.items())
+                         for name, stats in self.pool_stats().items()) or "no pools opened"
+
+
+# Shared by the whole CLI, so menu actions reuse pooled connections instead of connecting again
+CONNECTOR = DatabaseConnector()
+
+
+def mysql_engine():
+    """The shared, pooled SQLAlchemy engine."""
+    return CONNECTOR.connect_mysql()
+
+
+def mysql_connection():
+    """A pooled DB-API (PyMySQL) connection; close() returns it to the pool."""
+    return mysql_engine().raw_connection()
+
+
+def mongo_db():
+    """The configured database on the shared, pooled MongoClient."""
+    return CONNECTOR.connect_mongodb()[config.MYSQL_CONFIG['database']]
+
+
+def query_engine():
+    """The shared asynchronous query engine (utils/async_engine.py)."""
+    return CONNECTOR.connect_async()
@@ -0,0 +1,94 @@
+import hashlib
+import os
+import pickle
+import re
+import config
+from pymongo.errors import OperationFailure
+
+# MongoDB error code of a missing database or collection
+NAMESPACE_NOT_FOUND = 26
+
+# Profiles already loaded or computed in this process, keyed by (db_type, name)
+SESSION_METRICS = {}
+
+
+def profile_settings():
+    """Settings that change what the profilers produce; a change invalidates cached metrics."""
+    return (config.PROFILE_MODE, config.PROFILE_SAMPLE_SIZE, config.DISTINCT_MODE, config.HLL_ERROR,
+            config.NUMERIC_UNIQUE, config.OTHERS_UNQIUE)
+
+
+def mysql_table_version(cursor, table_name):
+    """Cheap version signal of a MySQL table from its statistics: creation time, last update time and row count."""
+    cursor.execute(
+        "SELECT CREATE_TIME, UPDATE_TIME, TABLE_ROWS FROM information_schema.tables "
+        "WHERE table_schema = DATABASE() AND table_name = %s;",
+        (table_name,))
+    return (cursor.fetchone(), profile_settings())
+
+
+def mongo_collection_version(collection):
+    """Cheap version signal of a MongoDB collection: its UUID plus document count and data size from $collStats.
+
+    None when the collection does not exist."""
+    info = next(collection.database.list_collections(filter={"name": collection.name}), None)
+    if info is None:
+        return None
+    try:
+        stats = next(collection.aggregate([{"$collStats": {"storageStats": {}}}]), {}).get("storageStats", {})
+    except OperationFailure as e:
+        # Dropped since it was listed ($collStats on a missing namespace fails on MongoDB 4.4+)
+        if e.code == NAMESPACE_NOT_FOUND:
+            return None
+        raise
+    return ((str(info.get("info", {}).get("uuid")), stats.get("count"), stats.get("size")), profile_settings())
+
+
+def schema_fingerprint(*parts):
+    """Short stable digest of a profile (table_info, mappings...), used to version what is derived from it."""
+    return hashlib.md5(repr(parts).encode('utf-8')).hexdigest()
+
+
+def file_safe(name):
+    return re.sub(r'[^A-Za-z0-9_.-]', '_', name)
+
+
+def cache_path(db_type, name):
+    return os.path.join(config.METRICS_CACHE_DIR, f"{db_type}__{file_safe(name)}.pkl")
+
+
+def load_metrics(db_type, name, version):
+    """Profile of `name` if it was saved at the same version (this session first, then on disk), else None."""
+    entry = SESSION_METRICS.get((db_type, name))
+    if entry is None and config.METRICS_CACHE_ENABLED:
+        try:
+            with open(cache_path(db_type, name), 'rb') as cache_file:
+                entry = pickle.load(cache_file)
+        except (OSError, pickle.PickleError, EOFError, AttributeError, ImportError):
+            return None
+        SESSION_METRICS[(db_type, name)] = entry
+    if entry is None or entry.get('version') != version:
+        return None
+    return entry['profile']
+
+
+def save_metrics(db_type, name, version, profile):
+    entry = {'version': version, 'profile': profile}
+    SESSION_METRICS[(db_type, name)] = entry
+    if not config.METRICS_CACHE_ENABLED:
+        return
+    os.makedirs(config.METRICS_CACHE_DIR, exist_ok=True)
+    path = cache_path(db_type, name)
+    # Write then rename so an interrupted save never leaves a truncated entry behind
+    with open(path + '.tmp', 'wb') as cache_file:
+        pickle.dump(entry, cache_file)
+    os.replace(path + '.tmp', path)
+
+
+def invalidate_metrics(db_type, name):
+    """Forget the cached profile of a table/collection, e.g. after it is re-uploaded or deleted."""
+    SESSION_METRICS.pop((db_type, name), None)
+    try:
+        os.remove(cache_path(db_type, name))
+    except OSError:
+        pass
@@ -0,0 +1,40 @@
+"""First documents of a MongoDB result plus its total count, without reading the whole result client-side."""
+import itertools
+import config
+from utils.result_cache import MONGO_WRITE_STAGES
+
+
+def find_window(collection, query, projection=None, modifiers=None, max_docs=None):
+    """(up to `max_docs` documents, total matching count) of a find with optional cursor modifiers (sort, limit, skip)."""
+    max_docs = max_docs or config.MONGO_PRINT_MAX_DOCS
+    modifiers = modifiers or {}
+    # One batch holds the window plus the document that tells whether there are more
+    cursor = collection.find(query, projection).batch_size(max_docs + 1)
+    for mod, args in modifiers.items():
+        cursor = getattr(cursor, mod)(args)
+    documents = list(itertools.islice(cursor, max_docs + 1))
+    cursor.close()
+    if len(documents) <= max_docs:
+        return documents, len(documents)
+    counts = {key: modifiers[key] for key in ("limit", "skip") if modifiers.get(key)}
+    return documents[:max_docs], collection.count_documents(query, **counts)
+
+
+def aggregate_window(collection, pipeline, max_docs=None):
+    """(up to `max_docs` documents, total count) of a pipeline, in one round trip through a $facet."""
+    max_docs = max_docs or config.MONGO_PRINT_MAX_DOCS
+    if any(stage in MONGO_WRITE_STAGES for step in pipeline for stage in step):
+        # $out/$merge must be the last stage, so they cannot run inside a $facet
+        documents = list(collection.aggregate(pipeline))
+        return documents[:max_docs], len(documents)
+    facet = {"$facet": {"documents": [{"$limit": max_docs}], "total": [{"$count": "count"}]}}
+    result = next(collection.aggregate(pipeline + [facet]), {"documents": [], "total": []})
+    total = result["total"][0]["count"] if result["total"] else 0
+    return result["documents"], total
+
+
+def query_window(collection, query, max_docs=None):
+    """Window of a natural-language query: a pipeline (list) or a find filter (dict)."""
+    if isinstance(query, list):
+        return aggregate_window(collection, query, max_docs)
+    return find_window(collection, query, max_docs=max_docs)
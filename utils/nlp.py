@@ -0,0 +1,59 @@
+"""NLTK resources for the natural-language parsers, loaded on first use and kept for the process.
+
+Importing nltk takes a noticeable part of a second, so it is deferred until the first question is
+parsed instead of being paid on every CLI start.
+"""
+import re
+
+# A leading greedy ".*" (not ".*?"/".*+"), which re.search retries from every start position
+LEADING_ANY = re.compile(r"^\.\*(?![?*+{])")
+
+# Tokenizer, tagger and stopword set, filled in by the accessors below on first use
+NLP_RESOURCES = {}
+
+
+def word_tokenize(text):
+    tokenize = NLP_RESOURCES.get('word_tokenize')
+    if tokenize is None:
+        from nltk.tokenize import word_tokenize as tokenize
+        NLP_RESOURCES['word_tokenize'] = tokenize
+    return tokenize(text)
+
+
+def pos_tag(tokens):
+    """Part-of-speech tags of `tokens`; only for patterns that need them, tagging is the slowest step."""
+    tag = NLP_RESOURCES.get('pos_tag')
+    if tag is None:
+        from nltk import pos_tag as tag
+        NLP_RESOURCES['pos_tag'] = tag
+    return tag(tokens)
+
+
+def stop_words():
+    """English stopwords, read from the NLTK corpus once."""
+    words = NLP_RESOURCES.get('stop_words')
+    if words is None:
+        from nltk.corpus import stopwords
+        words = frozenset(stopwords.words('english'))
+        NLP_RESOURCES['stop_words'] = words
+    return words
+
+
+def question_keywords(user_input):
+    """Lower-cased tokens of a question, without English stopwords."""
+    ignored = stop_words()
+    return [word for word in word_tokenize(user_input.lower()) if word not in ignored]
+
+
+def normalize_question(user_input):
+    """Lower-cased question with runs of whitespace collapsed, as the CLI reads it."""
+    return " ".join(user_input.lower().split())
+
+
+def compile_dispatch(pattern):
+    """Regex telling whether `pattern` matches anywhere in a question, for picking the handler.
+
+    re.search finds ".*X" exactly when it finds "X", but the leading ".*" runs to the end of the input and
+    backtracks from every start position, so it is dropped; the handler still gets the original pattern's match.
+    """
+    return re.compile(LEADING_ANY.sub("", pattern), re.IGNORECASE)
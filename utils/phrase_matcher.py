@@ -0,0 +1,61 @@
+from collections import deque
+
+
+class PhraseMatcher:
+    """Aho-Corasick automaton that finds every known phrase occurring in a text in one pass over it.
+
+    The cost of a lookup depends on the length of the text, not on how many phrases there are.
+    """
+
+    def __init__(self, phrases):
+        """`phrases` maps each phrase to the value reported for it; earlier phrases rank first."""
+        self.entries = []
+        self.goto = [{}]
+        self.fail = [0]
+        self.output = [[]]
+        for phrase, value in phrases.items():
+            if not phrase:
+                continue
+            state = 0
+            for char in phrase:
+                next_state = self.goto[state].get(char)
+                if next_state is None:
+                    next_state = len(self.goto)
+                    self.goto[state][char] = next_state
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.output.append([])
+                state = next_state
+            self.output[state].append(len(self.entries))
+            self.entries.append((phrase, value))
+
+        # Breadth-first, so the failure state (always shallower) is complete before it is used
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self.goto[state].items():
+                queue.append(next_state)
+                fallback = self.fail[state]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[next_state] = self.goto[fallback].get(char, 0)
+                self.output[next_state] = self.output[next_state] + self.output[self.fail[next_state]]
+
+    def matched_ids(self, text):
+        found = set()
+        state = 0
+        for char in text:
+            while state and char not in self.goto[state]:
+                state = self.fail[state]
+            state = self.goto[state].get(char, 0)
+            found.update(self.output[state])
+        return found
+
+    def matches(self, text):
+        """(phrase, value) of every phrase contained in `text`, in phrase order."""
+        return [self.entries[index] for index in sorted(self.matched_ids(text))]
+
+    def first(self, text):
+        """Value of the earliest phrase contained in `text`, or None."""
+        found = self.matched_ids(text)
+        return self.entries[min(found)][1] if found else None
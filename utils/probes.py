@@ -0,0 +1,42 @@
+import queue
+from concurrent.futures import ThreadPoolExecutor
+import config
+
+
+def run_column_probes(cursor, connect, probes, parallel=True):
+    """Run `probe(cursor)` for every probe and return the results in the order of `probes`.
+
+    With config.PROFILE_WORKERS > 1 and `parallel` set, the probes are spread over a pool of at most
+    that many connections opened with `connect()`; otherwise they run one after another on `cursor`.
+    """
+    workers = min(config.PROFILE_WORKERS, len(probes))
+    if not parallel or connect is None or workers <= 1:
+        return [probe(cursor) for probe in probes]
+
+    pool = queue.Queue()
+    connections = []
+
+    def run(probe):
+        connection = pool.get()
+        try:
+            probe_cursor = connection.cursor()
+            try:
+                return probe(probe_cursor)
+            finally:
+                probe_cursor.close()
+        finally:
+            pool.put(connection)
+
+    try:
+        # Each connection is used by one probe at a time; DB-API connections are not shared across threads
+        for _ in range(workers):
+            connection = connect()
+            if connection is None:
+                raise ConnectionError("Could not open a connection for parallel profiling.")
+            connections.append(connection)
+            pool.put(connection)
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(run, probes))
+    finally:
+        for connection in connections:
+            connection.close()
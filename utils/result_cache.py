@@ -0,0 +1,56 @@
+import copy
+import json
+import config
+from utils.lru_cache import LRUCache
+
+# Results of read-only queries, keyed by (db_type, table/collection, query text, table version)
+RESULT_CACHE = LRUCache(config.RESULT_CACHE_SIZE, ttl=config.RESULT_CACHE_TTL)
+
+# Pipeline stages that write, so their results are never reused
+MONGO_WRITE_STAGES = ("$out", "$merge")
+
+
+def query_key(query):
+    """Text form of a SQL statement or MongoDB pipeline/filter (key order is kept, it matters in $sort)."""
+    return query if isinstance(query, str) else json.dumps(query, default=str)
+
+
+def is_cacheable(query):
+    if isinstance(query, str):
+        return query.lstrip().upper().startswith("SELECT")
+    stages = query if isinstance(query, list) else []
+    return not any(stage in MONGO_WRITE_STAGES for step in stages if isinstance(step, dict) for stage in step)
+
+
+def cached_result(db_type, name, query, version, run):
+    """Result of `query` on table/collection `name` at `version`, running it with `run()` when not cached.
+
+    Errors (run() returning None) and results over RESULT_CACHE_MAX_ROWS rows are not kept.
+    """
+    if not is_cacheable(query):
+        return run()
+    result = get_result(db_type, name, query, version)
+    if result is None:
+        result = run()
+        store_result(db_type, name, query, version, result)
+        # Rows may be mutable documents; hand out a copy so the cached ones stay intact
+        result = copy.deepcopy(result)
+    return result
+
+
+def get_result(db_type, name, query, version):
+    """Copy of the cached result of `query` at `version`, or None."""
+    if not is_cacheable(query):
+        return None
+    return copy.deepcopy(RESULT_CACHE.get((db_type, name, query_key(query), version)))
+
+
+def store_result(db_type, name, query, version, result):
+    """Cache `result` unless it is an error (None), too long or from a query that is not cacheable."""
+    if result is not None and len(result) <= config.RESULT_CACHE_MAX_ROWS and is_cacheable(query):
+        RESULT_CACHE.put((db_type, name, query_key(query), version), result)
+
+
+def invalidate_results(db_type, name):
+    """Forget the cached results of a table/collection, e.g. after it is re-uploaded or deleted."""
+    return RESULT_CACHE.invalidate(lambda key: key[0] == db_type and key[1] == name)
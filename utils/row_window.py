@@ -0,0 +1,45 @@
+from collections import deque
+import config
+
+
+class RowWindow:
+    """Rows of a result read once, for display: all of them up to `max_rows`, otherwise the first `head` and the
+    last `tail` rows, plus the row count. Memory stays O(max_rows + tail) however long the result is."""
+
+    def __init__(self, max_rows=None, head=None, tail=None):
+        self.max_rows = max_rows or config.PRINT_MAX_ROWS
+        self.head_size = head or config.PRINT_HEAD_ROWS
+        self.head = []
+        # Ring buffer: appending past maxlen drops the oldest row
+        self.tail = deque(maxlen=tail or config.PRINT_TAIL_ROWS)
+        self.count = 0
+
+    def extend(self, rows):
+        for row in rows:
+            if len(self.head) < self.max_rows:
+                self.head.append(row)
+            self.tail.append(row)
+            self.count += 1
+
+    def __len__(self):
+        return self.count
+
+    @property
+    def truncated(self):
+        return self.count > self.max_rows
+
+    def shown(self):
+        """(first rows, last rows) to print; the last rows are empty unless the result was truncated."""
+        if not self.truncated:
+            return self.head, []
+        return self.head[:self.head_size], list(self.tail)
+
+
+def stream_rows(cursor, batch_size=None):
+    """Yield lists of rows from an executed cursor, `batch_size` per round trip, without reading the whole result."""
+    batch_size = batch_size or config.STREAM_FETCH_SIZE
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            return
+        yield rows
@@ -0,0 +1,119 @@
+import random
+import config
+
+MONGO_NUMBER_FILTER = {"$type": ["int", "long", "double", "decimal"], "$not": {"$eq": float('NaN')}}
+MONGO_STRING_FILTER = {"$type": "string"}
+
+
+def sampling_enabled():
+    return config.PROFILE_MODE == 'sample'
+
+
+def mysql_row_estimate(cursor, table_name):
+    """Row count estimate from the table statistics; no scan."""
+    cursor.execute(
+        "SELECT TABLE_ROWS FROM information_schema.tables WHERE table_schema = DATABASE() AND table_name = %s;",
+        (table_name,))
+    row = cursor.fetchone()
+    return row[0] if row and row[0] is not None else 0
+
+
+def mysql_range_key(cursor, table_name):
+    """Integer column leading an index (the primary key first), whose ranges can be read without a scan; or None."""
+    cursor.execute(
+        "SELECT s.COLUMN_NAME FROM information_schema.statistics s JOIN information_schema.columns c "
+        "ON c.table_schema = s.table_schema AND c.table_name = s.table_name AND c.COLUMN_NAME = s.COLUMN_NAME "
+        "WHERE s.table_schema = DATABASE() AND s.table_name = %s AND s.SEQ_IN_INDEX = 1 AND c.DATA_TYPE IN "
+        "('tinyint', 'smallint', 'mediumint', 'int', 'bigint') ORDER BY s.INDEX_NAME = 'PRIMARY' DESC LIMIT 1;",
+        (table_name,))
+    row = cursor.fetchone()
+    return row[0] if row else None
+
+
+def create_mysql_sample(cursor, table_name):
+    """Return the source to profile: the table itself, or a temporary table holding a random sample of it.
+
+    MySQL has no TABLESAMPLE. With an indexed integer key the sample is PROFILE_SAMPLE_RANGES runs of
+    consecutive keys starting at random offsets, each read from the index with a LIMIT, so only the sampled
+    rows are touched. Without one, every row is kept with probability RAND() < fraction (Bernoulli sampling,
+    a full scan). The sample is materialized once so every profiling query sees the same rows.
+    """
+    if not sampling_enabled():
+        return table_name
+    estimate = mysql_row_estimate(cursor, table_name)
+    if estimate <= config.PROFILE_SAMPLE_SIZE:
+        return table_name
+
+    sample_name = f"{table_name}_profile_sample"
+    cursor.execute(f"DROP TEMPORARY TABLE IF EXISTS {sample_name};")
+    key = mysql_range_key(cursor, table_name)
+    if key is not None:
+        cursor.execute(f"SELECT MIN(`{key}`), MAX(`{key}`) FROM {table_name};")
+        lowest, highest = cursor.fetchone()
+        # Sorted distinct offsets split the key space into disjoint ranges, so no row is sampled twice
+        starts = sorted(random.sample(range(lowest, highest + 1), min(config.PROFILE_SAMPLE_RANGES, highest - lowest + 1)))
+        rows_per_range = -(-config.PROFILE_SAMPLE_SIZE // len(starts))
+        cursor.execute(f"CREATE TEMPORARY TABLE {sample_name} AS SELECT * FROM {table_name} LIMIT 0;")
+        for start, end in zip(starts, starts[1:] + [highest + 1]):
+            cursor.execute(f"INSERT INTO {sample_name} SELECT * FROM {table_name} WHERE `{key}` >= %s AND `{key}` < %s "
+                           f"ORDER BY `{key}` LIMIT {rows_per_range};", (start, end))
+        print(f"Profiling {len(starts)} random `{key}` ranges (up to {config.PROFILE_SAMPLE_SIZE} rows) "
+              f"of ~{estimate} rows in '{table_name}'.")
+    else:
+        fraction = config.PROFILE_SAMPLE_SIZE / estimate
+        cursor.execute(f"CREATE TEMPORARY TABLE {sample_name} AS SELECT * FROM {table_name} "
+                       f"WHERE RAND() < {fraction:.10f};")
+        print(f"Profiling a Bernoulli sample of about {config.PROFILE_SAMPLE_SIZE} of ~{estimate} rows in "
+              f"'{table_name}' (no indexed integer key, so the table is scanned once).")
+    return sample_name
+
+
+def drop_mysql_sample(cursor, source, table_name):
+    if source != table_name:
+        cursor.execute(f"DROP TEMPORARY TABLE IF EXISTS {source};")
+
+
+def mysql_indexed_min_max(cursor, table_name, columns):
+    """Exact MIN/MAX of the columns that lead an index; MySQL resolves these from the index ends without a scan."""
+    cursor.execute(
+        "SELECT DISTINCT COLUMN_NAME FROM information_schema.statistics "
+        "WHERE table_schema = DATABASE() AND table_name = %s AND SEQ_IN_INDEX = 1;",
+        (table_name,))
+    indexed = [row[0] for row in cursor.fetchall() if row[0] in columns]
+    if not indexed:
+        return {}
+    select_list = ", ".join(f"MIN(`{column}`), MAX(`{column}`)" for column in indexed)
+    cursor.execute(f"SELECT {select_list} FROM {table_name};")
+    row = cursor.fetchone()
+    return {column: (row[2 * index], row[2 * index + 1]) for index, column in enumerate(indexed)}
+
+
+def mongo_sample_pipeline(collection):
+    """Pipeline prefix selecting the documents to profile: none for the whole collection, else a match on a sample.
+
+    The $sample is drawn once and pinned by _id, so every profiling aggregation (the $facet stats, the distinct
+    counts and the categorical values) reads the same documents rather than a fresh random sample each.
+    """
+    if not sampling_enabled():
+        return []
+    estimate = collection.estimated_document_count()
+    if estimate <= config.PROFILE_SAMPLE_SIZE:
+        return []
+    sampled = collection.aggregate([{"$sample": {"size": config.PROFILE_SAMPLE_SIZE}}, {"$project": {"_id": 1}}],
+                                   allowDiskUse=True)
+    ids = [document["_id"] for document in sampled]
+    print(f"Profiling a random sample of {len(ids)} of ~{estimate} documents in '{collection.name}'.")
+    return [{"$match": {"_id": {"$in": ids}}}]
+
+
+def mongo_indexed_fields(collection):
+    """Fields that lead an index, so their extremes can be read from the index ends."""
+    return {spec['key'][0][0] for spec in collection.index_information().values()}
+
+
+def mongo_indexed_extremes(collection, field, value_filter):
+    """Exact (min, max) of an indexed field among the values matching `value_filter`."""
+    lowest = collection.find_one({field: value_filter}, {field: 1, "_id": 0}, sort=[(field, 1)])
+    highest = collection.find_one({field: value_filter}, {field: 1, "_id": 0}, sort=[(field, -1)])
+    return (lowest[field] if lowest else None, highest[field] if highest else None)
+
@@ -0,0 +1,103 @@
+import hashlib
+import math
+import config
+
+
+def precision_for_error(error):
+    """Smallest register precision whose standard error (1.04 / sqrt(2^p)) is within `error`."""
+    precision = math.ceil(math.log2((1.04 / error) ** 2))
+    return min(max(precision, 4), 18)
+
+
+def hash64(value):
+    """Stable 64-bit hash of a value (the first 8 bytes of the MD5 of its string form)."""
+    return int.from_bytes(hashlib.md5(str(value).encode('utf-8')).digest()[:8], 'big')
+
+
+class HyperLogLog:
+    """HyperLogLog distinct-count sketch with a configurable standard error."""
+
+    def __init__(self, error=None):
+        self.error = error or config.HLL_ERROR
+        self.precision = precision_for_error(self.error)
+        self.register_count = 1 << self.precision
+        self.registers = bytearray(self.register_count)
+
+    def add(self, value):
+        # NULLs are not counted, same as COUNT(DISTINCT)
+        if value is None:
+            return
+        hashed = hash64(value)
+        shift = 64 - self.precision
+        index = hashed >> shift
+        rank = shift - (hashed & ((1 << shift) - 1)).bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def update(self, values):
+        for value in values:
+            self.add(value)
+
+    def merge_registers(self, rows):
+        """Merge (register index, rank) pairs, e.g. computed by the database."""
+        for index, rank in rows:
+            if index is not None and rank is not None and rank > self.registers[int(index)]:
+                self.registers[int(index)] = int(rank)
+
+    def count(self):
+        m = self.register_count
+        if m == 16:
+            alpha = 0.673
+        elif m == 32:
+            alpha = 0.697
+        elif m == 64:
+            alpha = 0.709
+        else:
+            alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / sum(2.0 ** -rank for rank in self.registers)
+
+        # Small-range correction: fall back to linear counting while registers are still empty
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * m and zeros:
+            estimate = m * math.log(m / zeros)
+        return int(round(estimate))
+
+
+def mysql_hll_query(source, column, precision):
+    """SQL that computes the HyperLogLog registers of a column on the server, one row per register."""
+    shift = 64 - precision
+    mask = (1 << shift) - 1
+    return (
+        f"SELECT h >> {shift}, MAX(IF(h & {mask} = 0, {shift + 1}, {shift} - LENGTH(BIN(h & {mask})) + 1)) "
+        f"FROM (SELECT CAST(CONV(LEFT(MD5(`{column}`), 16), 16, 10) AS UNSIGNED) AS h "
+        f"FROM {source} WHERE `{column}` IS NOT NULL) AS hashed "
+        f"GROUP BY h >> {shift};"
+    )
+
+
+def approx_distinct_mysql(cursor, source, column, error=None):
+    """Estimate COUNT(DISTINCT column) with a server-side HyperLogLog aggregate."""
+    sketch = HyperLogLog(error)
+    cursor.execute(mysql_hll_query(source, column, sketch.precision))
+    sketch.merge_registers(cursor.fetchall())
+    return sketch.count()
+
+
+def approx_distinct_mongo(collection, fields, pipeline=None, error=None):
+    """Estimate the distinct count of several fields client-side in one streaming pass.
+
+    `pipeline` optionally restricts the pass (e.g. to the sample of mongo_sample_pipeline).
+    """
+    sketches = {field: HyperLogLog(error) for field in fields}
+    projection = {field: 1 for field in fields}
+    projection["_id"] = 1 if "_id" in fields else 0
+    if pipeline:
+        documents = collection.aggregate(list(pipeline) + [{"$project": projection}], allowDiskUse=True,
+                                         batchSize=config.HLL_SCAN_BATCH_SIZE)
+    else:
+        documents = collection.find({}, projection, batch_size=config.HLL_SCAN_BATCH_SIZE)
+    for document in documents:
+        for field, sketch in sketches.items():
+            if field in document:
+                sketch.add(document[field])
+    return {field: sketch.count() for field, sketch in sketches.items()}